@@ -0,0 +1,156 @@
+# audio_dsp.py
+import math  # For dB conversions
+import numpy as np  # Vectorized sample processing
+from audio_writer import SAMPLE_RATE  # Pipeline output rate
+
+class AudioPostProcessor:
+    # Streaming clean-up between synthesis and the writer, one chunk at a time:
+    #  - trims near-silence from both ends of every chunk and puts back fixed gaps instead,
+    #    so pauses between sentences and around chapters are consistent
+    #  - normalizes loudness towards target_db (RMS, dBFS) with a gain that follows the
+    #    running loudness of the last `loudness_window` seconds of speech, across the chapters of a segment
+    #  - optionally resamples to output_rate (linear interpolation, continuous across chunks)
+    # All work happens in buffers that are allocated once and only grow when a chunk is
+    # longer than any before it, so steady-state processing allocates nothing. Arrays
+    # returned by process() and end_chapter() are views into those buffers and are only
+    # valid until the next call.
+    # Any object with the same sample_rate, settings(), reset(), start_chapter(), process() and
+    # end_chapter() can be passed to generate_audio_stream instead.
+
+    def __init__(self, sample_rate=SAMPLE_RATE, trim_db=-45.0, trim_margin=0.02, chunk_gap=0.25,
+                 chapter_lead=0.5, chapter_tail=1.5, target_db=-20.0, max_gain_db=12.0, loudness_window=30.0,
+                 output_rate=None):
+        # trim_db: level below which chunk edges count as silence (None disables trimming and padding)
+        # trim_margin: seconds kept around the detected speech so soft onsets aren't cut
+        # chunk_gap / chapter_lead / chapter_tail: seconds of silence between chunks, before a
+        # chapter's first chunk and after its last one
+        # target_db: RMS level to normalize speech to (None disables); max_gain_db caps boost and cut
+        self.input_rate = sample_rate
+        self.sample_rate = output_rate or sample_rate  # Rate of everything this stage returns
+        self.config = [sample_rate, trim_db, trim_margin, chunk_gap, chapter_lead, chapter_tail, target_db,
+                       max_gain_db, loudness_window, output_rate]
+        self.threshold = 10 ** (trim_db / 20) if trim_db is not None else None
+        self.margin = int(trim_margin * sample_rate)
+        trimming = self.threshold is not None
+        self.gap = int(chunk_gap * sample_rate) if trimming else 0
+        self.lead = int(chapter_lead * sample_rate) if trimming else 0
+        self.tail = int(chapter_tail * sample_rate) if trimming else 0
+        self.target_mean_square = 10 ** (target_db / 10) if target_db is not None else None
+        self.max_gain = 10 ** (max_gain_db / 20)
+        self.window = loudness_window * sample_rate  # Samples of speech the running loudness averages over
+        self.step = sample_rate / self.sample_rate  # Input samples per output sample
+        self.resampling = self.sample_rate != sample_rate
+        self.capacity = 0
+        self._reserve(sample_rate * 10)  # Ten seconds covers typical chunks
+        self.reset()
+
+    def reset(self):
+        # Forget everything carried over from earlier audio; called for every new output file, so
+        # each segment comes out the same whether or not the segments before it were rendered
+        self.mean_square = None  # Running loudness of the speech so far
+        self.first_in_chapter = True
+        self.previous = 0.0  # Last input sample of the previous call, for interpolating across calls
+        self.phase = 1.0  # Position of the next output sample, in samples after `previous`
+
+    def settings(self):
+        # Everything that shapes the output, for render manifests
+        return self.config
+
+    def _reserve(self, samples):
+        # Make sure every work buffer holds `samples` input samples (grows geometrically)
+        if samples <= self.capacity:
+            return
+        self.capacity = max(samples, 2 * self.capacity)
+        self.magnitude = np.empty(self.capacity, dtype=np.float32)  # |x| for silence detection
+        self.loud = np.empty(self.capacity, dtype=bool)  # |x| above the threshold
+        self.output = np.empty(self.capacity + max(self.gap, self.lead, self.tail), dtype=np.float32)
+        if self.resampling:
+            frames = int((len(self.output) + 2) / self.step) + 2  # Most output samples one call can produce
+            self.extended = np.empty(len(self.output) + 2, dtype=np.float32)  # previous + input + guard
+            self.steps = np.arange(frames, dtype=np.float64)
+            self.positions = np.empty(frames, dtype=np.float64)
+            self.floors = np.empty(frames, dtype=np.float64)
+            self.indexes = np.empty(frames, dtype=np.intp)
+            self.fractions = np.empty(frames, dtype=np.float32)
+            self.left = np.empty(frames, dtype=np.float32)
+            self.right = np.empty(frames, dtype=np.float32)
+
+    def _speech_bounds(self, audio):
+        # (start, end) of the part of a chunk louder than the threshold, plus a margin
+        if self.threshold is None:
+            return 0, len(audio)
+        magnitude = np.abs(audio, out=self.magnitude[:len(audio)])
+        loud = np.greater_equal(magnitude, self.threshold, out=self.loud[:len(audio)])
+        if not loud.any():
+            return 0, 0
+        start = int(loud.argmax())
+        loud = np.greater_equal(magnitude[::-1], self.threshold, out=loud)  # Reversed; argmax of a reversed view would copy
+        end = len(audio) - int(loud.argmax())
+        return max(0, start - self.margin), min(len(audio), end + self.margin)
+
+    def _normalize(self, speech):
+        # Scale speech towards the target level, following the running loudness
+        mean_square = float(np.dot(speech, speech)) / len(speech)
+        if self.mean_square is None:
+            self.mean_square = mean_square
+        else:
+            self.mean_square += min(1.0, len(speech) / self.window) * (mean_square - self.mean_square)
+        if self.mean_square > 0:
+            gain = min(self.max_gain, max(1 / self.max_gain, math.sqrt(self.target_mean_square / self.mean_square)))
+            np.multiply(speech, gain, out=speech)
+            np.clip(speech, -1.0, 1.0, out=speech)
+
+    def _resample(self, audio):
+        # Linear interpolation to the output rate; the phase and last sample carry over between calls
+        if not self.resampling:
+            return audio
+        length = len(audio)
+        extended = self.extended[:length + 2]
+        extended[0] = self.previous
+        extended[1:length + 1] = audio
+        extended[length + 1] = audio[-1] if length else self.previous  # Guard for a position exactly at the end
+        frames = int((length - self.phase) / self.step) + 1 if length >= self.phase else 0
+        positions = np.multiply(self.steps[:frames], self.step, out=self.positions[:frames])
+        positions += self.phase
+        floors = np.floor(positions, out=self.floors[:frames])
+        indexes = self.indexes[:frames]
+        indexes[:] = floors
+        fractions = self.fractions[:frames]
+        fractions[:] = np.subtract(positions, floors, out=positions)  # Plain assignment casts without a temporary
+        # mode="clip" writes straight into out (the default mode buffers a copy); indexes are in range anyway
+        left = np.take(extended, indexes, out=self.left[:frames], mode="clip")
+        indexes += 1
+        right = np.take(extended, indexes, out=self.right[:frames], mode="clip")
+        np.subtract(right, left, out=right)
+        np.multiply(right, fractions, out=right)
+        np.add(left, right, out=left)
+        self.phase += frames * self.step - length
+        if length:
+            self.previous = float(audio[-1])
+        return left
+
+    def start_chapter(self):
+        self.first_in_chapter = True  # Next chunk gets the chapter lead-in instead of the chunk gap
+
+    def process(self, audio):
+        # One pipeline chunk in, the processed chunk (with the silence before it) out
+        if audio is None:
+            return None
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self._reserve(len(audio))
+        start, end = self._speech_bounds(audio)
+        gap = self.lead if self.first_in_chapter else self.gap
+        self.first_in_chapter = False
+        output = self.output[:gap + end - start]
+        output[:gap] = 0.0
+        speech = output[gap:]
+        speech[:] = audio[start:end]
+        if self.target_mean_square is not None and len(speech):
+            self._normalize(speech)
+        return self._resample(output)
+
+    def end_chapter(self):
+        # Silence that closes a chapter
+        output = self.output[:self.tail]
+        output[:] = 0.0
+        return self._resample(output)
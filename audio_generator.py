@@ -1,64 +1,228 @@
 import os  # For creating directories and file paths
-import numpy as np  # For handling audio arrays
-import soundfile as sf  # For writing audio files
-from kokoro import KPipeline  # Text-to-speech pipeline
-from IPython.display import display, Audio  # For playing audio in Jupyter
+from collections import deque  # For titles of chapters that are still being synthesized
+from functools import partial  # For picklable pipeline factories
+from importlib.metadata import version, PackageNotFoundError  # For tagging cached audio with the model version
+import time  # For per-stage timing
+from audio_writer import SegmentWriter, open_writer, check_sample_rate, BOOK_FORMATS, SAMPLE_RATE  # Streams chunks straight into output files
+from tts_cache import ChunkCache, CachedPipeline  # Reuses audio for text that was already synthesized
+from parallel_tts import synthesize_in_order  # Multi-process synthesis with ordered results
+from tts_chunker import load_chunked_pipeline, synthesize_batched  # Sentence units and batching
+from render_manifest import RenderManifest, chapter_hash  # Skips segments that are already up to date
+from metrics import RenderMetrics  # Per-chapter, per-stage timings
 
-def generate_audio_segments(ordered_titles, ordered_chapters):
-    pipeline = KPipeline(lang_code='a', device='cuda')  # Create a TTS pipeline instance for a specific language
-    os.makedirs("audio", exist_ok=True)  # Create 'audio' directory if it doesn't exist
+def model_version():
+    # Cached audio is only valid for the kokoro release that produced it
+    try:
+        return version("kokoro")
+    except PackageNotFoundError:
+        return "unknown"
 
+def load_kokoro_pipeline(lang_code='a', device='cuda'):
+    # Imported here so worker processes and stub pipelines don't pay for loading kokoro up front
+    from kokoro import KPipeline  # Text-to-speech pipeline
+    return KPipeline(lang_code=lang_code, device=device)  # Create a TTS pipeline instance for a specific language
 
+def generate_audio_segments(ordered_titles, ordered_chapters, **options):
+    # Render parallel lists of titles and chapter texts; see generate_audio_stream for options
+    generate_audio_stream(zip(ordered_titles, ordered_chapters), **options)
 
-    segment_audio = []  # Stores audio segments for writing to file
-    segment_titles = []  # Stores corresponding chapter titles
-    timestamp_log = []  # Stores timestamps for each chapter
-    cumulative_samples = 0  # Total audio samples accumulated so far
-    sample_rate = 24000  # Fixed audio sample rate in Hz
+def segment_full(writer, chars, next_chars=None, chapters_per_segment=None, target_samples=None, target_bytes=None):
+    # A segment is closed before the next chapter once adding it would overshoot a target by more than
+    # stopping now falls short of it, which keeps segments close to the target. The next chapter's size
+    # is estimated from its length in characters (next_chars) at the samples and bytes per character of
+    # the `chars` characters written so far, or as the segment's average chapter when it is not known
+    chapters = len(writer.chapters)
+    if chapters_per_segment and chapters >= chapters_per_segment:
+        return True
+    share = next_chars / chars if next_chars is not None and chars else 1 / chapters  # Next chapter vs segment so far
+    if target_samples and writer.samples_written * (1 + share / 2) >= target_samples:
+        return True
+    return bool(target_bytes and writer.bytes_written * (1 + share / 2) >= target_bytes)
 
-    # Iterate through each chapter and title pair
-    for idx, (title, chapter_text) in enumerate(zip(ordered_titles, ordered_chapters)):
-        chapter_audio = []  # Stores audio chunks for current chapter
-        chapter_start = cumulative_samples / sample_rate  # Start time (in seconds) for current chapter
+def generate_audio_stream(chapters, subtype=None, segment_minutes=60, segment_mib=None, chapters_per_segment=None,
+                          voice='am_onyx', speed=1.25, lang_code='a', cache_dir="cache", cache_max_bytes=20 * 2**30,
+                          workers=1, device='cuda', load_pipeline=None, output_dir="audio", force=False,
+                          preview=False, metrics=None, report_path=None, output_format="wav", writer_options=None,
+                          unit_chars=None, batch_size=1, postprocess=None):
+    # chapters: any iterable of (title, chapter_text), e.g. a queue fed by the scraper
+    # load_pipeline: zero-argument (and, with workers > 1, picklable) pipeline factory; defaults to kokoro
+    # segment_minutes / segment_mib / chapters_per_segment: start a new segment file when any of these
+    # targets is reached (None for no limit); segments always end on a chapter boundary
+    # force: re-render every segment even if the manifest says it is up to date
+    # preview: print every chunk and play it in Jupyter; off by default so production renders stay headless
+    # metrics: RenderMetrics to record stage timings into; report_path: write its JSON/CSV report there at the end
+    # output_format: a segment format (wav, flac, opus, vorbis) or a single-file book with chapter markers (m4b, mka);
+    # writer_options: extra writer arguments, e.g. {"compression_level": 0.8} or {"bitrate": "48k"}
+    # unit_chars: pack sentences into units of up to this many characters before synthesis, e.g.
+    # tts_chunker.DEFAULT_UNIT_CHARS (None, the default, hands the pipeline whole chapters and keeps
+    # existing caches and manifests valid); batch_size: synthesize this many units per call, across chapters
+    # (needs unit_chars and workers == 1, and only saves time with pipelines that have a batch method)
+    # postprocess: a streaming stage between synthesis and the writer, e.g. audio_dsp.AudioPostProcessor;
+    # it only changes what gets written, so the TTS cache keeps the raw pipeline audio
+    if batch_size > 1 and (unit_chars is None or workers > 1):
+        raise ValueError("batch_size > 1 needs unit_chars and a single worker")
+    sample_rate = postprocess.sample_rate if postprocess is not None else SAMPLE_RATE  # Output sample rate in Hz
+    check_sample_rate(output_format, sample_rate)
+    if preview:
+        from IPython.display import display, Audio  # For playing audio in Jupyter
+    if metrics is None:
+        metrics = RenderMetrics()
+    load_pipeline = load_pipeline or partial(load_kokoro_pipeline, lang_code, device)
+    version_tag = model_version()
+    if unit_chars is not None:  # Sentence units change the audio, so they are part of what gets cached
+        load_pipeline = partial(load_chunked_pipeline, load_pipeline, unit_chars)
+        version_tag += f"+units{unit_chars}"
+    if cache_dir is None:  # Caching disabled
+        cache = None
+        pipeline = load_pipeline() if workers == 1 and batch_size == 1 else None
+    else:  # The real pipeline is only loaded if some chapter is not cached yet
+        cache = ChunkCache(cache_dir, max_bytes=cache_max_bytes)
+        pipeline = CachedPipeline(load_pipeline, cache, lang_code, version_tag)
+    os.makedirs(output_dir, exist_ok=True)  # Create output directory if it doesn't exist
+    manifest = RenderManifest(output_dir)  # Which segments are already complete, and from what input
+    settings = [voice, float(speed), lang_code, version_tag, output_format, subtype]  # Everything besides text that shapes the audio
+    if postprocess is not None:
+        settings.append(postprocess.settings())
+    book_mode = output_format in BOOK_FORMATS  # Whole book in one file instead of blocks of chapters
 
-        # Generate audio chunks using the pipeline
-        for i, (gs, ps, audio) in enumerate(pipeline(chapter_text, voice='am_onyx', speed=1.25, )):
-            print(f"Chapter {idx + 1}, chunk {i}:", gs, ps)
-            display(Audio(data=audio, rate=sample_rate, autoplay=(idx == 0 and i == 0)))
-            chapter_audio.append(audio)  # Append audio without checks
+    pending = deque()  # (number, title, chars, hash, starts a new segment) of chapters handed to the synthesizer
 
-        concatenated = np.concatenate(chapter_audio)  # Merge all audio chunks into one array
-        segment_audio.append(concatenated)  # Add to segment batch
-        segment_titles.append(title)  # Add title to segment batch
-        chapter_duration = len(concatenated)  # Number of samples in this chapter
-        timestamp_log.append((title, chapter_start))  # Log timestamp for this chapter
-        cumulative_samples += chapter_duration  # Update total samples
+    def chapter_texts():
+        # Feed the synthesizer only chapters that are not already in a finished segment. Segments are
+        # packed by actual duration while rendering, so a rerun reuses the packing the manifest recorded:
+        # wherever a recorded segment starts with the next chapter and all of its chapters are unchanged,
+        # that whole segment is skipped, and the segment being rendered before it ends there.
+        source = iter(chapters)
+        upcoming = deque()  # Chapters read ahead to compare against a recorded segment
+        number = 0
+        new_segment = True  # Next rendered chapter must open a new file
+        while True:
+            if not upcoming:
+                chapter = next(source, None)
+                if chapter is None:
+                    return
+                upcoming.append(chapter)
+            title, chapter_text = upcoming[0]
+            segment_file = os.path.basename(SegmentWriter.path_for(output_dir, title, output_format))
+            recorded = None if force or book_mode else manifest.completed_hashes(segment_file)
+            if recorded:
+                while len(upcoming) < len(recorded) and (chapter := next(source, None)) is not None:
+                    upcoming.append(chapter)
+                hashes = [chapter_hash(*chapter, settings) for chapter in list(upcoming)[:len(recorded)]]
+                if hashes == recorded:
+                    print(f"Skipping {segment_file}: chapters {number + 1}-{number + len(recorded)} unchanged")
+                    for _ in recorded:
+                        upcoming.popleft()
+                    number += len(recorded)
+                    new_segment = True
+                    continue
+            upcoming.popleft()
+            number += 1
+            pending.append((number, title, len(chapter_text), chapter_hash(title, chapter_text, settings), new_segment))
+            new_segment = False
+            yield chapter_text
 
-        # If 20 chapters accumulated or end of input, write to file
-        if len(segment_audio) == 10 or idx == len(ordered_chapters) - 1:
-            # Sanitize file name from title
-            segment_title = segment_titles[0].replace(" ", "_").replace("/", "_")
-            segment_path = os.path.join("audio", f"{segment_title}.wav")  # Audio file path
-            timestamp_path = os.path.join("audio", f"{segment_title}_timestamps.txt")  # Timestamp log path
+    if workers > 1:  # Chapters are synthesized in worker processes and handed back in chapter order
+        chapter_chunks = synthesize_in_order(chapter_texts(), voice, speed, load_pipeline, workers, cached=pipeline)
+    elif batch_size > 1:  # Units from consecutive chapters share batched pipeline calls
+        chapter_chunks = synthesize_batched(chapter_texts(), load_pipeline, voice, speed, batch_size, cached=pipeline)
+    else:
+        chapter_chunks = (pipeline(chapter_text, voice=voice, speed=speed) for chapter_text in chapter_texts())
 
-            # Delete existing files if present
-            if os.path.exists(segment_path):
-                os.remove(segment_path)
-            if os.path.exists(timestamp_path):
-                os.remove(timestamp_path)
+    writer = None  # Segment (or book) file currently being written
+    hashes = []  # Input hashes of the chapters in the current segment
+    superseded = []  # Recorded segments that started at a chapter the current segment absorbed
+    targets = {} if book_mode else {  # Single-file books are never split
+        "chapters_per_segment": chapters_per_segment,
+        "target_samples": segment_minutes * 60 * sample_rate if segment_minutes else None,
+        "target_bytes": segment_mib * 2**20 if segment_mib else None,
+    }
 
-            # Write combined audio to file
-            with sf.SoundFile(segment_path, mode='w', samplerate=sample_rate, channels=1) as writer:
-                for audio_data in segment_audio:
-                    writer.write(audio_data)
+    def publish(writer, hashes, superseded):
+        # Publish a finished segment and drop the older segments it repacked, so no chapter is on disk twice
+        writer.close()
+        for segment_file in superseded:
+            SegmentWriter.remove_output(os.path.join(output_dir, segment_file))
+        manifest.record(os.path.basename(writer.path), [
+            {"title": chapter_title, "hash": chapter_digest, "samples": samples}
+            for (chapter_title, start), chapter_digest, samples in zip(writer.chapters, hashes, writer.chapter_samples())
+        ], superseded)
 
-            # Write timestamps to file in HH:MM:SS format
-            with open(timestamp_path, "w") as ts_file:
-                for title, start in timestamp_log:
-                    minutes, seconds = divmod(int(start), 60)
-                    hours, minutes = divmod(minutes, 60)
-                    ts_file.write(f"{hours:02d}:{minutes:02d}:{seconds:02d} {title}\n")
+    try:
+        # Iterate through each chapter's generated audio chunks, in chapter order
+        idx = 0
+        upcoming = None  # Next chapter's chunks, when they were read early to learn its length
+        while True:
+            chunks = upcoming if upcoming is not None else next(chapter_chunks, None)
+            upcoming = None
+            if chunks is None:
+                break
+            number, title, chars, digest, new_segment = pending.popleft()
+            if new_segment and writer is not None:  # The next chapters were skipped, so this segment ends here
+                publish(writer, hashes, superseded)
+                writer = None
+            if writer is None:  # Start a new segment file named after its first chapter
+                writer = open_writer(output_dir, title, output_format, sample_rate=sample_rate, subtype=subtype,
+                                     **(writer_options or {}))
+                hashes, superseded = [], []
+                segment_chars = 0  # Characters of text in this segment
+                if postprocess is not None:
+                    postprocess.reset()  # Every segment is processed as if it were rendered on its own
+            elif not book_mode:  # A recorded segment starting here is repacked into this one
+                segment_file = os.path.basename(SegmentWriter.path_for(output_dir, title, output_format))
+                if segment_file in manifest.segments:
+                    superseded.append(segment_file)
+            writer.start_chapter(title)  # Log timestamp for this chapter
+            hashes.append(digest)
+            segment_chars += chars
+            if postprocess is not None:
+                postprocess.start_chapter()
 
-            # Reset for next batch
-            segment_audio, segment_titles, timestamp_log = [], [], []
-            cumulative_samples = 0
+            # Append each audio chunk to the segment as it arrives, timing synthesis and writing separately
+            chapter_start_sample = writer.samples_written
+            synth_seconds = write_seconds = 0.0
+            started = time.perf_counter()
+            for i, (gs, ps, audio) in enumerate(chunks):
+                produced = time.perf_counter()
+                synth_seconds += produced - started
+                if preview:
+                    print(f"Chapter {number}, chunk {i}:", gs, ps)
+                    display(Audio(data=audio, rate=SAMPLE_RATE, autoplay=(idx == 0 and i == 0)))
+                if postprocess is not None:
+                    audio = postprocess.process(audio)  # Trimmed, padded and leveled, in the stage's own buffer
+                writer.write(audio, gs)  # The chunk's text goes into the seek index
+                started = time.perf_counter()
+                write_seconds += started - produced
+            synth_seconds += time.perf_counter() - started  # Time until the pipeline reported the chapter done
+            tail = postprocess.end_chapter() if postprocess is not None else None
+            if tail is not None and len(tail):
+                writer.write(tail)  # Closing silence, a chunk without text in the seek index
+            metrics.finish_chapter(number, title, chars, (writer.samples_written - chapter_start_sample) / sample_rate,
+                                   synth_seconds, write_seconds)
+
+            idx += 1
+
+            # Once the segment has reached its target, publish the file and record it in the manifest.
+            # The synthesizers read ahead, so the next chapter's length is usually known already;
+            # otherwise its text is read now (its audio is still only made when iterated)
+            if any(targets.values()) and not pending:
+                upcoming = next(chapter_chunks, None)
+            if segment_full(writer, segment_chars, pending[0][2] if pending else None, **targets):
+                publish(writer, hashes, superseded)
+                writer = None
+
+        if writer is not None:  # The last segment (or a single-file book) ends with the stream
+            publish(writer, hashes, superseded)
+            writer = None
+    finally:
+        chapter_chunks.close()  # Stop any worker processes still running
+        if writer is not None:  # Interrupted mid-segment: keep the previous complete file, if any
+            writer.abort()
+        if cache is not None:
+            cache.save()  # Persist recency updates from cache hits
+            stats = cache.stats()
+            print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MiB")
+        print(metrics.progress_line())  # Final totals
+        if report_path is not None:
+            metrics.write_report(report_path)
@@ -0,0 +1,283 @@
+# audio_writer.py
+import json  # For seek indexes
+import os  # For building segment file paths
+import subprocess  # For driving ffmpeg when writing single-file books
+import numpy as np  # For normalizing audio chunks before writing
+import soundfile as sf  # For writing audio files
+
+SAMPLE_RATE = 24000  # Fixed kokoro output sample rate in Hz
+
+# Segment formats soundfile can encode incrementally: name -> (container, default subtype, extension)
+SEGMENT_FORMATS = {
+    "wav": ("WAV", "PCM_16", ".wav"),
+    "flac": ("FLAC", "PCM_16", ".flac"),
+    "opus": ("OGG", "OPUS", ".opus"),
+    "vorbis": ("OGG", "VORBIS", ".ogg"),
+}
+# Single-file book formats encoded by ffmpeg: name -> (ffmpeg muxer, codec, default bitrate, extension)
+BOOK_FORMATS = {
+    "m4b": ("ipod", "aac", "64k", ".m4b"),
+    "mka": ("matroska", "libopus", "32k", ".mka"),
+}
+
+# Sample rates a segment format's encoder accepts; other formats take any rate (ffmpeg resamples book formats itself)
+FORMAT_SAMPLE_RATES = {"opus": (8000, 12000, 16000, 24000, 48000)}
+
+def check_sample_rate(output_format, sample_rate):
+    # Fail before anything is rendered if the format can't be encoded at this rate
+    rates = FORMAT_SAMPLE_RATES.get(output_format)
+    if sample_rate <= 0 or (rates is not None and sample_rate not in rates):
+        allowed = ", ".join(str(rate) for rate in rates) if rates is not None else "any positive rate"
+        raise ValueError(f"{output_format} output can't be written at {sample_rate} Hz (supported: {allowed})")
+
+def output_extension(output_format):
+    formats = SEGMENT_FORMATS if output_format in SEGMENT_FORMATS else BOOK_FORMATS
+    return formats[output_format][-1]
+
+def segment_name(title):
+    # Sanitize file name from title
+    return title.replace(" ", "_").replace("/", "_")
+
+def format_timestamp(start):
+    # Format a start time (in seconds) as HH:MM:SS.mmm
+    seconds, milliseconds = divmod(round(start * 1000), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+def write_timestamps(timestamp_path, chapters, sample_rate):
+    # Write (title, start sample) pairs to file in HH:MM:SS format, atomically
+    temp_timestamp_path = timestamp_path + ".part"
+    with open(temp_timestamp_path, "w") as ts_file:
+        for title, start in chapters:
+            ts_file.write(f"{format_timestamp(start / sample_rate)} {title}\n")
+    os.replace(temp_timestamp_path, timestamp_path)
+
+def write_index(index_path, index):
+    # Write a seek index as compact JSON, atomically
+    temp_index_path = index_path + ".part"
+    with open(temp_index_path, "w", encoding="utf-8") as index_file:
+        json.dump(index, index_file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_index_path, index_path)
+
+def read_index(index_path):
+    # Load the seek index written next to an output file
+    with open(index_path, "r", encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+def to_pcm16(audio):
+    # Float samples in [-1, 1] as little-endian 16-bit PCM bytes
+    data = np.asarray(audio, dtype=np.float32).reshape(-1)
+    return (np.clip(data, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def escape_metadata(value):
+    # Escape characters that are special in ffmpeg's FFMETADATA format
+    for character in "\\=;#\n":
+        value = value.replace(character, "\\" + character)
+    return value
+
+class ChapterWriter:
+    # Shared bookkeeping for writers: chapters are (title, start sample) pairs recorded
+    # against a running count of samples written. Every chunk's position and source text
+    # is kept too, and written on close as a seek index next to the audio:
+    #   {"file", "sample_rate", "samples",
+    #    "chapters": [{"title", "start", "samples", "chunks": [[start, samples, text], ...]}, ...]}
+    # All offsets are in samples from the start of the file, so a player can seek to any
+    # chapter or chunk (sentence group) without decoding anything before it.
+
+    @staticmethod
+    def path_for(output_dir, first_title, output_format="wav"):
+        # Output files are named after their first chapter
+        return os.path.join(output_dir, f"{segment_name(first_title)}{output_extension(output_format)}")
+
+    @staticmethod
+    def index_path_for(path):
+        # Seek index written next to an output file
+        return os.path.splitext(path)[0] + "_index.json"
+
+    @staticmethod
+    def timestamp_path_for(path):
+        # Chapter timestamp log written next to an output file
+        return os.path.splitext(path)[0] + "_timestamps.txt"
+
+    @classmethod
+    def remove_output(cls, path):
+        # Delete a published output file together with its timestamps and seek index
+        for output_path in (path, cls.timestamp_path_for(path), cls.index_path_for(path)):
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    def start_chapter(self, title):
+        self.chapters.append((title, self.samples_written))  # Chapter starts where the last one ended
+        self.chunks.append([])
+
+    def _advance(self, samples, text):
+        # Account for a chunk that has just been written
+        if self.chunks:  # Writes before the first chapter have nothing to be indexed under
+            self.chunks[-1].append([self.samples_written, samples, text])
+        self.samples_written += samples
+
+    def index(self):
+        # Seek index for everything written so far
+        chapters = [{"title": title, "start": start, "samples": samples, "chunks": chunks}
+                    for (title, start), samples, chunks in zip(self.chapters, self.chapter_samples(), self.chunks)]
+        return {"file": os.path.basename(self.path), "sample_rate": self.sample_rate,
+                "samples": self.samples_written, "chapters": chapters}
+
+    def chapter_samples(self):
+        # Number of samples written for each chapter so far
+        starts = [start for title, start in self.chapters] + [self.samples_written]
+        return [end - start for start, end in zip(starts, starts[1:])]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class SegmentWriter(ChapterWriter):
+    # Streams audio chunks for a block of chapters straight into one segment file.
+    # Only the chunk currently being written is held in memory; chapter positions
+    # are tracked as running sample offsets and written out as timestamps on close.
+
+    def __init__(self, output_dir, first_title, sample_rate=SAMPLE_RATE, subtype=None, output_format="wav",
+                 compression_level=None):
+        container, default_subtype, extension = SEGMENT_FORMATS[output_format]
+        self.path = self.path_for(output_dir, first_title, output_format)  # Audio file path
+        self.timestamp_path = self.timestamp_path_for(self.path)  # Timestamp log path
+        self.index_path = self.index_path_for(self.path)  # Seek index path
+        self.sample_rate = sample_rate
+        self.samples_written = 0  # Total samples written to this segment so far
+        self.chapters = []  # (title, start sample) for every chapter in this segment
+        self.chunks = []  # [start sample, samples, text] for every chunk, per chapter
+
+        # Audio goes to a temp file that only replaces the real one once the segment is complete
+        self.temp_path = self.path + ".part"
+        options = {} if compression_level is None else {"compression_level": compression_level}  # 0.0 fastest .. 1.0 smallest
+        self.sound_file = sf.SoundFile(self.temp_path, mode='w', samplerate=sample_rate, channels=1,
+                                       subtype=subtype or default_subtype, format=container, **options)
+
+    @property
+    def bytes_written(self):
+        # Size of the segment on disk so far
+        return os.path.getsize(self.temp_path)
+
+    def write(self, audio, text=None):
+        # Append one chunk; text is the chunk's source text (gs) for the seek index
+        samples = 0
+        if audio is not None:  # Pipelines without a model yield no audio
+            data = np.asarray(audio, dtype=np.float32).reshape(-1)  # Accept numpy arrays and CPU tensors alike
+            self.sound_file.write(data)  # Append chunk to the open segment file
+            samples = len(data)
+        self._advance(samples, text)  # Update running sample offset
+
+    def close(self):
+        # Finish the segment: publish the audio and its timestamps under their final names
+        if self.sound_file.closed:
+            return
+        self.sound_file.close()
+        os.replace(self.temp_path, self.path)  # Atomic, so a crash never leaves a truncated file
+        write_timestamps(self.timestamp_path, self.chapters, self.sample_rate)
+        write_index(self.index_path, self.index())
+
+    def abort(self):
+        # Drop an unfinished segment, leaving any previously completed file in place
+        if self.sound_file.closed:
+            return
+        self.sound_file.close()
+        os.remove(self.temp_path)
+
+class BookWriter(ChapterWriter):
+    # Streams the whole book into one compressed file with embedded chapter markers.
+    # Audio is piped to an ffmpeg encoder as it arrives, so nothing is buffered and no
+    # uncompressed copy is written. Chapter starts are kept as sample offsets across the
+    # whole book; on close they are muxed in as chapters with a 1/sample_rate timebase
+    # (sample-accurate) by a stream copy of the already-compressed audio.
+
+    def __init__(self, output_dir, title, sample_rate=SAMPLE_RATE, output_format="m4b", bitrate=None, ffmpeg="ffmpeg"):
+        self.muxer, codec, default_bitrate, extension = BOOK_FORMATS[output_format]
+        self.path = self.path_for(output_dir, title, output_format)  # Book file path
+        self.timestamp_path = self.timestamp_path_for(self.path)  # Timestamp log path
+        self.index_path = self.index_path_for(self.path)  # Seek index path
+        self.title = title
+        self.sample_rate = sample_rate
+        self.ffmpeg = ffmpeg
+        self.samples_written = 0  # Total samples written to the book so far
+        self.chapters = []  # (title, start sample) for every chapter in the book
+        self.chunks = []  # [start sample, samples, text] for every chunk, per chapter
+
+        self.temp_path = self.path + ".part"  # Encoded audio without chapters
+        self.process = subprocess.Popen(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+             "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+             "-c:a", codec, "-b:a", bitrate or default_bitrate, "-f", self.muxer, self.temp_path],
+            stdin=subprocess.PIPE)
+
+    @property
+    def closed(self):
+        return self.process.stdin.closed
+
+    def write(self, audio, text=None):
+        # Append one chunk; text is the chunk's source text (gs) for the seek index
+        samples = 0
+        if audio is not None:  # Pipelines without a model yield no audio
+            pcm = to_pcm16(audio)
+            self.process.stdin.write(pcm)  # Encoded by ffmpeg while synthesis continues
+            samples = len(pcm) // 2
+        self._advance(samples, text)  # Update running sample offset
+
+    def _metadata(self):
+        # FFMETADATA chapter list in samples
+        lines = [";FFMETADATA1", f"title={escape_metadata(self.title)}"]
+        ends = [start for title, start in self.chapters[1:]] + [self.samples_written]
+        for (title, start), end in zip(self.chapters, ends):
+            lines += ["[CHAPTER]", f"TIMEBASE=1/{self.sample_rate}", f"START={start}", f"END={end}",
+                      f"title={escape_metadata(title)}"]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        # Finish encoding, then mux the chapter markers in and publish the book atomically
+        if self.closed:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed encoding {self.path}")
+
+        metadata_path = self.path + ".chapters.txt"
+        with open(metadata_path, "w", encoding="utf-8") as metadata_file:
+            metadata_file.write(self._metadata())
+        muxed_path = self.path + ".muxed"
+        try:
+            # The input is probed: muxers like ipod have no demuxer of the same name
+            subprocess.run([self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                            "-i", self.temp_path, "-i", metadata_path,
+                            "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1", "-c", "copy",
+                            "-f", self.muxer, muxed_path], check=True)
+            os.replace(muxed_path, self.path)  # Atomic, so a crash never leaves a truncated book
+        finally:
+            for path in (metadata_path, muxed_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        os.remove(self.temp_path)  # Only once muxed; a failed remux leaves the encoded audio in the .part file
+        write_timestamps(self.timestamp_path, self.chapters, self.sample_rate)
+        write_index(self.index_path, self.index())
+
+    def abort(self):
+        # Drop an unfinished book, leaving any previously completed file in place
+        if self.closed:
+            return
+        self.process.stdin.close()
+        self.process.kill()
+        self.process.wait()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+def open_writer(output_dir, first_title, output_format="wav", sample_rate=SAMPLE_RATE, subtype=None, **options):
+    # Writer for one segment file, or for the whole book in a single-file format
+    if output_format in BOOK_FORMATS:
+        return BookWriter(output_dir, first_title, sample_rate=sample_rate, output_format=output_format, **options)
+    return SegmentWriter(output_dir, first_title, sample_rate=sample_rate, subtype=subtype,
+                         output_format=output_format, **options)
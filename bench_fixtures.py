@@ -0,0 +1,220 @@
+# bench_fixtures.py
+# Offline stand-ins for the outside world used by benchmark.py: a fake KPipeline,
+# synthetic books and a local copy of the fiction site.
+import html  # For escaping fixture pages
+import http.server  # For the local fixture site
+import re  # For splitting text into lines like kokoro
+import textwrap  # For wrapping fixture HTML like a CMS does
+import threading  # For serving fixtures in the background
+import time  # For the fake model's compute cost and simulated latency
+import numpy as np  # For synthetic audio
+from audio_writer import SAMPLE_RATE  # Sample rate of the real pipeline
+
+WORDS = "the dead walk again and the necromancer counts his bones by lantern light".split()  # Filler vocabulary
+
+class FakePipeline:
+    # Stands in for kokoro's KPipeline: splits text on line breaks like its default
+    # split_pattern, then yields (graphemes, phonemes, audio) chunks with a deterministic
+    # tone whose length follows the text at a fixed speaking rate. Every chunk costs one
+    # forward pass: a fixed call_seconds plus real_time_factor per second of audio.
+
+    def __init__(self, chars_per_second=15.0, chunk_chars=300, sample_rate=SAMPLE_RATE, real_time_factor=0.0,
+                 load_seconds=0.0, call_seconds=0.0):
+        self.chars_per_second = chars_per_second  # Speaking rate at speed 1.0
+        self.chunk_chars = chunk_chars  # Roughly how much text kokoro puts in one chunk
+        self.sample_rate = sample_rate
+        self.real_time_factor = real_time_factor  # Seconds of busy work per second of audio
+        self.call_seconds = call_seconds  # Fixed cost of every forward pass, however short the chunk
+        self.calls = 0  # Pipeline calls so far (a batch counts once)
+        time.sleep(load_seconds)  # Stands in for loading model and voice weights
+
+    def tone(self, gs, speed=1.0):
+        # The audio for one chunk's text: a deterministic tone as long as the text takes to say
+        samples = int(len(gs) / (self.chars_per_second * speed) * self.sample_rate)  # Spoken duration
+        t = np.arange(samples, dtype=np.float32) / self.sample_rate
+        return (0.1 * np.sin(2 * np.pi * (200 + len(gs) % 100) * t)).astype(np.float32)
+
+    def _chunks(self, text, speed):
+        # (gs, ps, audio) for every chunk, without any compute cost
+        for line in re.split(r"\n+", text.strip()):
+            if not line.strip():
+                continue
+            for start in range(0, len(line), self.chunk_chars):
+                gs = line[start:start + self.chunk_chars]  # Text for this chunk
+                yield gs, gs.lower(), self.tone(gs, speed)
+
+    def _compute(self, audio_samples):
+        # Burn CPU like a real forward pass would
+        deadline = time.perf_counter() + self.call_seconds + audio_samples / self.sample_rate * self.real_time_factor
+        while time.perf_counter() < deadline:
+            pass
+
+    def __call__(self, text, voice=None, speed=1.0):
+        self.calls += 1
+        for gs, ps, audio in self._chunks(text, speed):
+            self._compute(len(audio))
+            yield gs, ps, audio
+
+    def batch(self, texts, voice=None, speed=1.0):
+        # Batched forward pass: [[(gs, ps, audio), ...] per text], paying call_seconds once per batch
+        self.calls += 1
+        results = [list(self._chunks(text, speed)) for text in texts]
+        self._compute(sum(len(audio) for chunks in results for gs, ps, audio in chunks))
+        return results
+
+def synthetic_book(hours, chars_per_second=15.0, chapter_minutes=20):
+    # Build (titles, chapters) whose spoken length adds up to roughly `hours` hours.
+    # chapter_minutes may also be a list of lengths, used in turn, for a book with uneven chapters
+    if isinstance(chapter_minutes, (int, float)):
+        lengths = [chapter_minutes] * max(1, int(hours * 60 / chapter_minutes))  # Minutes per chapter
+    else:
+        lengths = []
+        while sum(lengths) < hours * 60:
+            lengths.append(chapter_minutes[len(lengths) % len(chapter_minutes)])
+    titles, chapters = [], []
+    for number, minutes in enumerate(lengths, 1):
+        chapter_chars = int(minutes * 60 * chars_per_second)  # Characters in this chapter
+        words = []
+        length = 0
+        while length < chapter_chars:
+            word = WORDS[(number + len(words)) % len(WORDS)]
+            words.append(word)
+            length += len(word) + 1
+        titles.append(f"Book_1_Chapter_{number}")
+        chapters.append(f"Book 1 and Chapter {number}\n" + " ".join(words))
+    return titles, chapters
+
+DIALOGUE_LINE_CHARS = (18, 240, 32, 11, 420, 60, 25, 150)  # Line lengths, in turn: short dialogue among paragraphs
+
+def synthetic_dialogue_book(chapters, lines_per_chapter=150):
+    # (titles, chapters) like synthetic_book, but with the short dialogue lines and chapter
+    # header lines of a real serial, which kokoro turns into a long tail of tiny chunks
+    titles, texts = [], []
+    for number in range(1, chapters + 1):
+        lines = [f"Book 1 and Chapter {number}"]
+        lines += [synthetic_line(number, i, DIALOGUE_LINE_CHARS[i % len(DIALOGUE_LINE_CHARS)])
+                  for i in range(lines_per_chapter)]
+        titles.append(f"Book_1_Chapter_{number}")
+        texts.append("\n".join(lines))
+    return titles, texts
+
+CHAPTER_LEVELS = (0.1, 0.03, 0.25, 0.06)  # Speech amplitude per chapter, in turn: sessions recorded at different levels
+
+def synthetic_chunks(chapters, chunks_per_chapter=40, levels=CHAPTER_LEVELS, seed=0):
+    # [[audio, ...] per chapter] shaped like kokoro output: 2-16 s of speech (a tone) between a quiet
+    # lead-in and tail of uneven length, at a different level in each chapter
+    rng = np.random.default_rng(seed)
+    pipeline = FakePipeline()
+    book = []
+    for number in range(chapters):
+        chunks = []
+        for i in range(chunks_per_chapter):
+            speech = pipeline.tone("x" * int(rng.integers(30, 300))) * np.float32(levels[number % len(levels)] / 0.1)
+            lead, tail = (rng.uniform(0.05, 0.6, 2) * SAMPLE_RATE).astype(int)
+            noise = (rng.standard_normal(lead + tail) * 1e-4).astype(np.float32)  # Room tone under the threshold
+            chunks.append(np.concatenate([noise[:lead], speech, noise[lead:]]))
+        book.append(chunks)
+    return book
+
+def synthetic_line(number, i, line_chars):
+    # Deterministic prose line of about line_chars characters, sometimes with a B<n> reference
+    words = []
+    length = 0
+    while length < line_chars:
+        word = WORDS[(number + i + len(words)) % len(WORDS)]
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words) + (f" As told in B{number % 7 + 1}." if i % 10 == 0 else "")
+
+def synthetic_chapter(number, line_chars=400, lines_per_chapter=200, decorative_every=25):
+    # One chapter in the format the scraper writes: a "B1C<n> - Title" header, prose lines
+    # and a decorative scene break every `decorative_every` lines (0 for none)
+    lines = [f"B1C{number} - The {WORDS[number % len(WORDS)]}", ""]
+    for i in range(lines_per_chapter):
+        if decorative_every and i % decorative_every == decorative_every - 1:
+            lines.append("  ~~~~~~~~~~  ")  # Decorative scene break
+        else:
+            lines.append(synthetic_line(number, i, line_chars))
+    return "\n".join(lines) + "\n\n" + "=" * 80 + "\n\n"  # Same divider as text_scraper.save_chapters
+
+def synthetic_book_text(chapters, **chapter_options):
+    # A whole raw book.txt as one string
+    return "".join(synthetic_chapter(number, **chapter_options) for number in range(1, chapters + 1))
+
+def write_synthetic_book_file(path, chapters=None, size_mb=None, **chapter_options):
+    # Write a raw book.txt with a fixed number of chapters, or until it reaches size_mb.
+    # Returns the number of chapters written.
+    target = int(size_mb * 2**20) if size_mb is not None else None
+    written, number = 0, 0
+    with open(path, "w", encoding="utf-8") as book_file:
+        while (number < chapters) if target is None else (written < target):
+            number += 1
+            chunk = synthetic_chapter(number, **chapter_options)
+            book_file.write(chunk)
+            written += len(chunk.encode("utf-8"))
+    return number
+
+FIXTURE_SELECTORS = (  # Same page structure main.py scrapes
+    "div.row.fic-header h1",
+    "div.chapter-inner.chapter-content",
+    "div.portlet-body > div.row.nav-buttons > div.col-xs-6.col-md-4.col-md-offset-4.col-lg-3.col-lg-offset-6 > a",
+)
+
+def with_headerless_pages(chapters, prose_chars=3000):
+    # Chapters of a serial with a "Prelude" page before the first one and an "Interlude" page halfway,
+    # neither with a "Book N and Chapter M" header, like the side stories real serials post
+    pages = list(chapters)
+    for position, name in ((len(pages) // 2, "Interlude"), (0, "Prelude")):
+        pages.insert(position, f"{name}\n" + synthetic_line(position, 0, prose_chars))
+    return pages
+
+def fixture_page(number, chapter_count, chapter_text):
+    # Render one synthetic chapter page with a header, content and next button. The header is the
+    # chapter's first line, with chapter headers shortened to "B1C<n> - Title" like the real site.
+    # Paragraph source is wrapped and indented the way real pages are; a browser renders each <p>
+    # as one line regardless
+    header = chapter_text.split("\n", 1)[0]
+    match = re.match(r"Book (\d+) and Chapter (\d+)$", header)
+    if match:
+        header = f"B{match.group(1)}C{match.group(2)} - The {WORDS[int(match.group(2)) % len(WORDS)]}"
+    paragraphs = "".join(f"<p>\n  {textwrap.fill(html.escape(line), 78, subsequent_indent='  ')}\n</p>"
+                         for line in chapter_text.splitlines()[1:])
+    next_link = (f'<a class="btn" href="/chapter/{number + 1}">Next <i>Chapter</i></a>'
+                 if number < chapter_count else '<button class="btn" disabled>Next</button>')
+    return (f'<html><head><title>Chapter {number}</title></head><body>'
+            f'<div class="row fic-header"><div class="col"><h1>{html.escape(header)}</h1></div></div>'
+            f'<div class="portlet-body"><div class="chapter-inner chapter-content">{paragraphs}</div>'
+            f'<div class="row nav-buttons"><div class="col-xs-6 col-md-4 col-md-offset-4 col-lg-3 col-lg-offset-6">'
+            f'{next_link}</div></div></div></body></html>')
+
+def serve_fixture_book(chapters, latency=0.0):
+    # Serve chapters at /chapter/1..N on a local port; returns (server, first chapter URL).
+    # Pages are rendered per request, so chapters appended to the list later get published
+    # like new chapters of a running serial. server.requests counts pages served
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so connection pooling matters
+
+        def do_GET(self):
+            time.sleep(latency)  # Simulated network round trip
+            number = self.path.rsplit("/", 1)[-1]
+            with lock:
+                server.requests += 1
+            if not number.isdigit() or not 1 <= int(number) <= len(chapters):
+                self.send_error(404)
+                return
+            body = fixture_page(int(number), len(chapters), chapters[int(number) - 1]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Keep benchmark output clean
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/chapter/1"
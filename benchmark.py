@@ -0,0 +1,857 @@
+#!/usr/bin/env python3
+# benchmark.py
+# Offline benchmarks for the parts of the pipeline we control. Nothing here needs
+# kokoro, CUDA or network access: bench_fixtures provides a fake KPipeline, synthetic
+# books and a local fixture site. Every benchmark returns rows that are printed as a
+# table and, with --json, saved so runs can be compared over time.
+import argparse  # For command line options
+import contextlib  # For silencing per-chunk progress output
+import filecmp  # For comparing rendered outputs
+import io  # For silencing per-chunk progress output
+import json  # For machine-readable results
+import os  # For file and directory handling
+import platform  # For recording where a run happened
+import re  # For the reference text implementation
+import shutil  # For finding ffmpeg
+import subprocess  # For recording which commit was measured
+import tempfile  # For scratch output directories
+import time  # For wall-clock timing
+import tracemalloc  # For measuring peak Python/NumPy memory
+from datetime import datetime, timezone  # For timestamping results
+from functools import partial  # For picklable fake pipeline factories
+import numpy as np  # For the old buffered write pattern
+import soundfile as sf  # For reading segments back through their seek index
+from audio_writer import SegmentWriter, SEGMENT_FORMATS, BOOK_FORMATS, SAMPLE_RATE, read_index  # Streaming segment writer under test
+from tts_cache import ChunkCache, normalize_text  # Content-addressed TTS cache under test
+from audio_generator import generate_audio_segments  # Render loop under test
+from audio_dsp import AudioPostProcessor  # Post-processing stage under test
+from text_engine import iter_book  # Streaming text engine under test
+from text_scraper import clean_text, extract_chapters_and_titles  # Whole-string text API under test
+from bench_fixtures import (FakePipeline, synthetic_book, synthetic_dialogue_book, synthetic_book_text, write_synthetic_book_file,
+                            synthetic_chunks, serve_fixture_book, with_headerless_pages, FIXTURE_SELECTORS)
+
+MIB = 2**20
+
+def timed(function, *args, **kwargs):
+    # Run once and return (seconds, result)
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def peak_memory(function, *args, **kwargs):
+    # Run once under tracemalloc and return the peak traced bytes
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def quietly(function, *args, **kwargs):
+    # Run without the render loop's per-chunk progress output
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+# ---- Text stage ----
+
+def reference_clean_text(text):
+    # The original whole-string clean_text, kept as a baseline
+    cleaned_lines = []
+    for line in text.splitlines():
+        stripped_line = line.strip()
+        if re.match(r'^\s*[=~\-*_\.]{3,}\s*$', stripped_line):
+            continue
+        line = re.sub(r'\bB(\d+)(C(\d+))?\b', lambda m: f"Book {m.group(1)}" + (f" and Chapter {m.group(3)}" if m.group(3) else ""), line)
+        cleaned_lines.append(line)
+    return "\n".join(cleaned_lines)
+
+def reference_extract_chapters_and_titles(text):
+    # The original list-building extract_chapters_and_titles, kept as a baseline exactly as it
+    # shipped, including its title bug: each chapter is stored under the next chapter's header
+    ordered_titles, ordered_chapters, current, current_title = [], [], [], None
+    for line in text.splitlines():
+        match = re.match(r"^Book (\d+) and Chapter (\d+)", line)
+        if match:
+            current_title = f"Book_{match.group(1)}_Chapter_{match.group(2)}"
+            if current:
+                ordered_chapters.append("\n".join(current))
+                ordered_titles.append(current_title or "segment")
+                current = []
+        current.append(line)
+    if current:
+        ordered_chapters.append("\n".join(current))
+        ordered_titles.append(current_title or "segment")
+    return ordered_titles, ordered_chapters
+
+def book_text_options(args):
+    return {"line_chars": args.line_chars, "lines_per_chapter": args.lines_per_chapter,
+            "decorative_every": args.decorative_every}
+
+def bench_clean(args):
+    # clean_text over a whole raw book held in memory
+    text = synthetic_book_text(args.chapters, **book_text_options(args))
+    rows = []
+    for implementation, function in (("reference", reference_clean_text), ("current", clean_text)):
+        seconds, _ = timed(function, text)
+        rows.append({"benchmark": "clean_text", "implementation": implementation, "chapters": args.chapters,
+                     "mib": len(text) / MIB, "seconds": seconds, "mib_per_s": len(text) / MIB / seconds})
+    return rows
+
+def bench_extract(args):
+    # extract_chapters_and_titles over a whole cleaned book held in memory
+    text = clean_text(synthetic_book_text(args.chapters, **book_text_options(args)))
+    rows = []
+    results = {}
+    for implementation, function in (("reference", reference_extract_chapters_and_titles),
+                                     ("current", extract_chapters_and_titles)):
+        seconds, (titles, chapters) = timed(function, text)
+        assert len(chapters) == args.chapters
+        results[implementation] = titles, chapters
+        rows.append({"benchmark": "extract_chapters_and_titles", "implementation": implementation,
+                     "chapters": args.chapters, "mib": len(text) / MIB, "seconds": seconds,
+                     "mib_per_s": len(text) / MIB / seconds})
+    (reference_titles, reference_chapters), (titles, chapters) = results["reference"], results["current"]
+    assert reference_chapters == chapters  # Same chapter text; only the titles were fixed
+    assert reference_titles[:-1] == titles[1:] and reference_titles[-1] == titles[-1]  # The old off-by-one
+    return rows
+
+def text_whole_file(path):
+    # Old main.py flow: read everything, clean everything, split everything
+    with open(path, "r", encoding="utf-8") as book_file:
+        titles, chapters = reference_extract_chapters_and_titles(reference_clean_text(book_file.read()))
+    return len(chapters)
+
+def text_streaming(path):
+    # New flow: chapters come out one at a time and are dropped after use
+    return sum(1 for _ in iter_book(path))
+
+def bench_text(args):
+    # Throughput and peak memory of reading, cleaning and splitting a book.txt
+    with tempfile.TemporaryDirectory() as book_dir:
+        path = os.path.join(book_dir, "book.txt")
+        chapter_count = write_synthetic_book_file(path, size_mb=args.size_mb, **book_text_options(args))
+        size = os.path.getsize(path)
+        rows = []
+        for mode, run in (("whole-file", text_whole_file), ("streaming", text_streaming)):
+            seconds, count = timed(run, path)
+            assert count == chapter_count
+            peak = peak_memory(run, path)  # Separate pass: tracing slows everything down
+            rows.append({"benchmark": "text", "mode": mode, "chapters": chapter_count, "mib": size / MIB,
+                         "seconds": seconds, "mib_per_s": size / MIB / seconds, "peak_mib": peak / MIB})
+        return rows
+
+# ---- Segment writing ----
+
+def render_streaming(titles, chapters, output_dir, load_pipeline, chapters_per_segment=10, subtype=None, output_format="wav",
+                     cache_dir=None):
+    # The real render loop (generate_audio_stream, with its manifest, metrics and seek index), segmented
+    # by chapter count like the buffered baseline
+    quietly(generate_audio_segments, titles, chapters, load_pipeline=load_pipeline, output_dir=output_dir,
+            cache_dir=cache_dir, segment_minutes=None, chapters_per_segment=chapters_per_segment, subtype=subtype,
+            output_format=output_format)
+
+def render_buffered(titles, chapters, output_dir, load_pipeline, chapters_per_segment=10, subtype=None, output_format="wav"):
+    # The previous write pattern: whole chapters are concatenated and held until the segment is full
+    pipeline = load_pipeline()
+    segment_audio, segment_titles = [], []
+    for idx, (title, chapter_text) in enumerate(zip(titles, chapters)):
+        chapter_audio = [audio for gs, ps, audio in pipeline(chapter_text, voice='am_onyx', speed=1.25)]
+        segment_audio.append(np.concatenate(chapter_audio))
+        segment_titles.append(title)
+        if len(segment_audio) == chapters_per_segment or idx == len(chapters) - 1:
+            with SegmentWriter(output_dir, segment_titles[0], subtype=subtype, output_format=output_format) as writer:
+                for audio_data in segment_audio:
+                    writer.write(audio_data)
+            segment_audio, segment_titles = [], []
+
+def directory_size(path):
+    # Bytes of all files directly inside a directory
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def bench_segments(args):
+    # Segment writing speed, size on disk and peak memory per format; streaming peak should not grow with book length
+    rows = []
+    for hours in args.hours:
+        titles, chapters = synthetic_book(hours)
+        modes = [("streaming", render_streaming)] + ([("buffered", render_buffered)] if args.buffered else [])
+        for output_format in args.formats:
+            for mode, render in modes:
+                options = {"subtype": args.subtype, "output_format": output_format}
+                with tempfile.TemporaryDirectory() as output_dir:
+                    seconds, _ = timed(render, titles, chapters, output_dir, FakePipeline, **options)
+                    size = directory_size(output_dir)
+                with tempfile.TemporaryDirectory() as output_dir:
+                    peak = peak_memory(render, titles, chapters, output_dir, FakePipeline, **options)
+                rows.append({"benchmark": "segments", "mode": mode, "format": output_format,
+                             "subtype": args.subtype or SEGMENT_FORMATS[output_format][1], "hours": hours,
+                             "seconds": seconds, "x_realtime": hours * 3600 / seconds, "disk_mib": size / MIB,
+                             "peak_mib": peak / MIB})
+    return rows + check_book_formats(args.book_formats)
+
+def ffmpeg_chapters(path):
+    # [(start seconds, title)] of the chapter markers in a media file, read back with ffmpeg
+    metadata = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path, "-f", "ffmetadata", "-"],
+                              capture_output=True, text=True, check=True).stdout
+    chapters = []
+    for block in metadata.split("[CHAPTER]")[1:]:
+        fields = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+        numerator, denominator = fields["TIMEBASE"].split("/")
+        chapters.append((int(fields["START"]) * int(numerator) / int(denominator), fields.get("title")))
+    return chapters
+
+def decoded_samples(path):
+    # Length of a media file's audio in samples at SAMPLE_RATE, by decoding it
+    pcm = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path, "-f", "s16le", "-ac", "1",
+                          "-ar", str(SAMPLE_RATE), "-"], capture_output=True, check=True).stdout
+    return len(pcm) // 2
+
+def check_book_formats(book_formats, chapters=4, chapter_minutes=3):
+    # Single-file books through the real render loop: the file must be published (no .part left
+    # behind), decode to the indexed length and carry one marker per chapter where the index puts it.
+    # Skipped without ffmpeg on PATH
+    if not book_formats:
+        return []
+    if shutil.which("ffmpeg") is None:
+        print(f"Skipping book formats ({', '.join(book_formats)}): ffmpeg not found")
+        return []
+    titles, chapters = synthetic_book(chapters * chapter_minutes / 60, chapter_minutes=chapter_minutes)
+    rows = []
+    for output_format in book_formats:
+        with tempfile.TemporaryDirectory() as output_dir:
+            seconds = render_quietly(output_dir, titles, chapters, load_pipeline=FakePipeline, output_format=output_format)
+            assert not [name for name in os.listdir(output_dir) if name.endswith((".part", ".muxed"))], os.listdir(output_dir)
+            index = read_index(SegmentWriter.index_path_for(SegmentWriter.path_for(output_dir, titles[0], output_format)))
+            path = os.path.join(output_dir, index["file"])
+            markers = ffmpeg_chapters(path)
+            assert [title for start, title in markers] == [chapter["title"] for chapter in index["chapters"]], markers
+            marker_error = max(abs(start - chapter["start"] / index["sample_rate"])
+                               for (start, title), chapter in zip(markers, index["chapters"]))
+            assert marker_error < 0.01, marker_error
+            length_error = abs(decoded_samples(path) - index["samples"]) / SAMPLE_RATE
+            assert length_error < 0.1, length_error  # Encoder priming and padding only
+            rows.append({"benchmark": "book formats", "format": output_format, "chapters": len(markers),
+                         "audio_minutes": index["samples"] / index["sample_rate"] / 60, "seconds": seconds,
+                         "marker_error_ms": marker_error * 1000, "length_error_ms": length_error * 1000,
+                         "mib": os.path.getsize(path) / MIB})
+    return rows
+
+# ---- Rendering ----
+
+def bench_cache(args):
+    # Re-render a book after editing one chapter: only that chapter should reach the pipeline. Every
+    # run writes to a fresh output directory, so the manifest skips nothing and each chapter asks the cache
+    titles, chapters = synthetic_book(args.chapters * args.chapter_minutes / 60, chapter_minutes=args.chapter_minutes)
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_dir = os.path.join(work_dir, "cache")
+        for run in ("cold", "warm", "edited"):
+            if run == "edited":
+                chapters[len(chapters) // 2] += " One more line."  # Small edit in the middle of the book
+            pipelines = []  # Loaded only on a cache miss
+
+            def load_pipeline():
+                pipelines.append(FakePipeline())
+                return pipelines[-1]
+
+            seconds, _ = timed(render_streaming, titles, chapters, os.path.join(work_dir, run), load_pipeline,
+                               cache_dir=cache_dir)
+            misses = sum(pipeline.calls for pipeline in pipelines)  # One pipeline call per uncached chapter
+            rows.append({"benchmark": "cache", "run": run, "chapters": len(chapters), "seconds": seconds,
+                         "hits": len(chapters) - misses, "misses": misses})
+    return rows + bench_cache_commits(args.commit_entries)
+
+def bench_cache_commits(entries, chunks_per_entry=50, chunk_chars=300):
+    # Cost of committing one chapter-sized entry as the cache fills up; should not grow with cache size
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    text = "x" * chunk_chars
+    commit_ms = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ChunkCache(cache_dir)
+        for number in range(entries):
+            entry = cache.writer(f"entry{number}")
+            for chunk in range(chunks_per_entry):
+                entry.write(text, text, audio[:SAMPLE_RATE // chunks_per_entry])
+            began = time.perf_counter()
+            entry.commit()
+            commit_ms.append((time.perf_counter() - began) * 1000)
+        cache.save()
+        check_cache_recovery(cache_dir, entries)
+    window = max(1, entries // 10)
+    return [{"benchmark": "cache commits", "entries": entries, "first_ms": sum(commit_ms[:window]) / window,
+             "last_ms": sum(commit_ms[-window:]) / window, "total_seconds": sum(commit_ms) / 1000}]
+
+def check_cache_recovery(cache_dir, entries):
+    # What a killed render leaves behind: an entry committed after the last index flush, one still
+    # being written (a .f32.tmp) and one whose audio was published just before the crash but whose
+    # sidecar wasn't. Reopening keeps the first and deletes the rest, so all audio on disk is counted
+    cache = ChunkCache(cache_dir)
+    cache.writer("committed").commit()
+    unfinished = cache.writer("unfinished")
+    unfinished.write("x", "x", np.zeros(SAMPLE_RATE, dtype=np.float32))
+    unfinished.file.close()
+    with open(os.path.join(cache_dir, "orphan.f32"), "wb") as orphan:
+        np.zeros(SAMPLE_RATE, dtype=np.float32).tofile(orphan)
+    cache = ChunkCache(cache_dir)
+    names = os.listdir(cache_dir)
+    assert not [name for name in names if name.endswith(".tmp") or name.startswith("orphan")], names
+    assert len(cache.entries) == entries + 1
+    assert cache.total_bytes == sum(os.path.getsize(os.path.join(cache_dir, name)) for name in names if name.endswith(".f32"))
+
+def render_quietly(output_dir, titles, chapters, **kwargs):
+    # Run generate_audio_segments without per-chunk output; returns seconds
+    seconds, _ = timed(quietly, generate_audio_segments, titles, chapters, cache_dir=None,
+                       output_dir=output_dir, **kwargs)
+    return seconds
+
+def bench_parallel(args):
+    # Worker-pool rendering must produce byte-identical segments and timestamps to the serial path
+    assert args.workers > 1, "--workers must be at least 2, or the serial path is compared with itself"
+    titles, chapters = synthetic_book(args.chapters * args.chapter_minutes / 60, chapter_minutes=args.chapter_minutes)
+    load_pipeline = partial(FakePipeline, real_time_factor=args.real_time_factor)
+    with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as parallel_dir:
+        serial = render_quietly(serial_dir, titles, chapters, load_pipeline=load_pipeline)
+        parallel = render_quietly(parallel_dir, titles, chapters, load_pipeline=load_pipeline, workers=args.workers)
+        files = sorted(os.listdir(serial_dir))
+        match, mismatch, errors = filecmp.cmpfiles(serial_dir, parallel_dir, files, shallow=False)
+        assert files == sorted(os.listdir(parallel_dir)) and not mismatch and not errors, (mismatch, errors)
+    return [{"benchmark": "parallel", "workers": args.workers, "serial_seconds": serial,
+             "parallel_seconds": parallel, "speedup": serial / parallel, "identical_files": len(match)}]
+
+def check_seek_index(output_dir, speed=1.25):
+    # Every indexed chunk must read back, by seeking straight to it, as the fake audio for its text.
+    # Returns (chunks checked, mean seconds per seek and read)
+    checked, seek_seconds = 0, 0.0
+    pipeline = FakePipeline()
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith("_index.json"):
+            continue
+        index = read_index(os.path.join(output_dir, name))
+        path = os.path.join(output_dir, index["file"])
+        assert sf.info(path).frames == index["samples"], name
+        position = 0
+        with sf.SoundFile(path) as sound_file:
+            for chapter in index["chapters"]:
+                assert chapter["start"] == position and sum(n for start, n, text in chapter["chunks"]) == chapter["samples"]
+                for start, samples, text in chapter["chunks"]:
+                    assert start == position, (name, start, position)
+                    position += samples
+                    began = time.perf_counter()
+                    sound_file.seek(start)
+                    audio = sound_file.read(samples, dtype="float32")
+                    seek_seconds += time.perf_counter() - began
+                    expected = pipeline.tone(text, speed)
+                    assert np.allclose(audio, expected, atol=1e-4), (name, start)
+                    checked += 1
+        assert position == index["samples"], name
+    return checked, seek_seconds / max(checked, 1)
+
+def bench_packing(args):
+    # Fixed chapter-count segments vs duration-targeted packing on a book with very uneven chapters,
+    # checking every segment's seek index against the audio on disk and that reruns repack cleanly
+    titles, chapters = synthetic_book(args.hours, chapter_minutes=args.chapter_minutes)
+    rows = []
+    for mode, options in ((f"{args.chapters_per_segment} chapters", {"chapters_per_segment": args.chapters_per_segment,
+                                                                    "segment_minutes": None}),
+                          (f"{args.segment_minutes:g} minutes", {"segment_minutes": args.segment_minutes})):
+        with tempfile.TemporaryDirectory() as output_dir:
+            seconds = render_quietly(output_dir, titles, chapters, load_pipeline=FakePipeline, **options)
+            minutes = np.array([sf.info(os.path.join(output_dir, name)).frames / SAMPLE_RATE / 60
+                                for name in os.listdir(output_dir) if name.endswith(".wav")])
+            checked, seek_seconds = check_seek_index(output_dir)
+        rows.append({"benchmark": "packing", "mode": mode, "chapters": len(chapters), "segments": len(minutes),
+                     "min_minutes": minutes.min(), "max_minutes": minutes.max(), "stdev_minutes": minutes.std(),
+                     "seconds": seconds, "indexed_chunks": checked, "seek_ms": seek_seconds * 1000})
+    return rows + check_repacking()
+
+def check_repacking(chapter_count=12, chapter_minutes=15, segment_minutes=60):
+    # Shorten a chapter in the middle of a segment and edit one at the start of a later segment: the
+    # rerun packs the segments differently, and every chapter must still be on disk exactly once
+    titles, chapters = synthetic_book(chapter_count * chapter_minutes / 60, chapter_minutes=chapter_minutes)
+    with tempfile.TemporaryDirectory() as output_dir:
+        render_quietly(output_dir, titles, chapters, load_pipeline=FakePipeline, segment_minutes=segment_minutes)
+        before = sorted(name for name in os.listdir(output_dir) if name.endswith(".wav"))
+        chapters = list(chapters)
+        chapters[6] = chapters[6][:len(chapters[6]) // 4]
+        chapters[10] += " Edited."
+        render_quietly(output_dir, titles, chapters, load_pipeline=FakePipeline, segment_minutes=segment_minutes)
+        after = sorted(name for name in os.listdir(output_dir) if name.endswith(".wav"))
+        indexes = [read_index(os.path.join(output_dir, name)) for name in os.listdir(output_dir) if name.endswith("_index.json")]
+        with open(os.path.join(output_dir, "manifest.json"), "r", encoding="utf-8") as manifest_file:
+            recorded = sorted(json.load(manifest_file)["segments"])
+    on_disk = sorted(chapter["title"] for index in indexes for chapter in index["chapters"])
+    assert on_disk == sorted(titles), on_disk  # No chapter missing or left behind in a superseded segment
+    assert recorded == after == sorted(index["file"] for index in indexes), (recorded, after)
+    return [{"benchmark": "repacking", "chapters": len(titles), "segments_before": len(before),
+             "segments_after": len(after), "removed": len(set(before) - set(after))}]
+
+def index_chunks(output_dir):
+    # Source text of every chunk in the seek indexes of a render, per chapter
+    chapters = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith("_index.json"):
+            chapters += [[text for start, samples, text in chapter["chunks"]]
+                         for chapter in read_index(os.path.join(output_dir, name))["chapters"]]
+    return chapters
+
+def bench_chunking(args):
+    # Whole chapters (kokoro picks the chunks) vs sentence units vs units batched across chapters,
+    # on a book full of short dialogue lines, with a fake model that pays a fixed cost per call
+    titles, chapters = synthetic_dialogue_book(args.chapters, args.lines_per_chapter)
+    load_pipeline = partial(FakePipeline, real_time_factor=args.real_time_factor, call_seconds=args.call_seconds)
+    modes = [("whole chapters", {"unit_chars": None}), (f"{args.unit_chars}-char units", {"unit_chars": args.unit_chars}),
+             (f"units, batches of {args.batch_size}", {"unit_chars": args.unit_chars, "batch_size": args.batch_size})]
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for mode, options in modes:
+            output_dir = os.path.join(work_dir, str(len(rows)))
+            seconds = render_quietly(output_dir, titles, chapters, load_pipeline=load_pipeline, **options)
+            chunks = index_chunks(output_dir)
+            assert len(chunks) == len(chapters)
+            audio_seconds = manifest_audio_seconds(output_dir)
+            lengths = [len(text) for chapter in chunks for text in chapter]
+            rows.append({"benchmark": "chunking", "mode": mode, "chunks_per_chapter": len(lengths) / len(chapters),
+                         "mean_chunk_chars": sum(lengths) / len(lengths), "short_chunks": sum(n < 50 for n in lengths),
+                         "seconds": seconds, "chars_per_s": sum(map(len, chapters)) / seconds,
+                         "x_realtime": audio_seconds / seconds})
+        files = sorted(os.listdir(os.path.join(work_dir, "1")))
+        match, mismatch, errors = filecmp.cmpfiles(os.path.join(work_dir, "1"), os.path.join(work_dir, "2"), files, shallow=False)
+        assert not mismatch and not errors, (mismatch, errors)  # Batching must not change the audio
+    return rows
+
+def manifest_audio_seconds(output_dir):
+    # Total rendered audio according to the render manifest
+    with open(os.path.join(output_dir, "manifest.json"), "r", encoding="utf-8") as manifest_file:
+        segments = json.load(manifest_file)["segments"]
+    return sum(chapter["samples"] for segment in segments.values() for chapter in segment["chapters"]) / SAMPLE_RATE
+
+def bench_e2e(args):
+    # main.py's render flow (book.txt -> text engine -> TTS -> segments) with the fake pipeline,
+    # cold and then rerun on the unchanged book
+    from main import render_book
+    load_pipeline = partial(FakePipeline, real_time_factor=args.real_time_factor)
+    with tempfile.TemporaryDirectory() as work_dir:
+        book_path = os.path.join(work_dir, "book.txt")
+        chapter_count = write_synthetic_book_file(book_path, chapters=args.chapters, **book_text_options(args))
+        render_options = {"output_dir": os.path.join(work_dir, "audio"), "cache_dir": os.path.join(work_dir, "cache"),
+                          "load_pipeline": load_pipeline, "workers": args.workers}
+        seconds, _ = timed(quietly, render_book, book_path, **render_options)
+        audio_seconds = manifest_audio_seconds(render_options["output_dir"])
+        rerun_seconds, _ = timed(quietly, render_book, book_path, **render_options)
+    return [{"benchmark": "e2e", "chapters": chapter_count, "workers": args.workers, "audio_hours": audio_seconds / 3600,
+             "seconds": seconds, "x_realtime": audio_seconds / seconds, "rerun_seconds": rerun_seconds}]
+
+def follow_job(events, started, ready, ready_on):
+    # Consume a daemon job's events, noting when it starts and setting `ready` on the `ready_on` event
+    for event in events:
+        if event["event"] == "started":
+            started.append(event["job"])
+        if event["event"] == ready_on:
+            ready.set()
+
+def bench_daemon(args):
+    # Warm daemon vs loading a pipeline per job, with a stub model that takes --load-seconds to load.
+    # Also an integration check: the daemon must write byte-identical output to a direct render and
+    # start queued jobs highest priority first
+    from tts_daemon import TTSDaemon
+    from tts_client import submit_chapters, shutdown
+    import threading
+    titles, chapters = synthetic_book(args.chapters * args.chapter_minutes / 60, chapter_minutes=args.chapter_minutes)
+    load_pipeline = partial(FakePipeline, load_seconds=args.load_seconds)
+    with tempfile.TemporaryDirectory() as work_dir:
+        direct_dirs = [os.path.join(work_dir, f"direct{job}") for job in range(args.jobs)]
+        daemon_dirs = [os.path.join(work_dir, f"daemon{job}") for job in range(args.jobs)]
+        direct = sum(render_quietly(output_dir, titles, chapters, load_pipeline=load_pipeline) for output_dir in direct_dirs)
+
+        socket_path = os.path.join(work_dir, "tts.sock")
+        with contextlib.redirect_stdout(io.StringIO()):
+            daemon = TTSDaemon(socket_path, load_pipeline=lambda lang_code: load_pipeline(), cache_dir=None)
+            server = threading.Thread(target=daemon.serve_forever)
+            server.start()
+            try:
+                daemon.preload(["a"])  # Startup cost, paid once before any job
+                start = time.perf_counter()
+                for output_dir in daemon_dirs:
+                    for event in submit_chapters(titles, chapters, socket_path, output_dir=output_dir):
+                        pass
+                warm = time.perf_counter() - start
+
+                # A slow job holds the worker while a low and then a high priority job queue up behind it
+                started, followers = [], []
+                slow = {"titles": titles, "chapters": chapters, "socket_path": socket_path,
+                        "output_dir": os.path.join(work_dir, "slow")}
+                jobs = [dict(slow, priority=0), dict(slow, priority=1, output_dir=os.path.join(work_dir, "low")),
+                        dict(slow, priority=5, output_dir=os.path.join(work_dir, "high"))]
+                for job in jobs:
+                    ready = threading.Event()
+                    ready_on = "queued" if followers else "started"  # Later jobs must queue behind a running one
+                    follower = threading.Thread(target=follow_job, args=(submit_chapters(**job), started, ready, ready_on))
+                    follower.start()
+                    ready.wait()
+                    followers.append(follower)
+                for follower in followers:
+                    follower.join()
+            finally:
+                shutdown(socket_path)
+                server.join()
+
+        identical = 0
+        for direct_dir, daemon_dir in zip(direct_dirs, daemon_dirs):
+            files = sorted(os.listdir(direct_dir))
+            match, mismatch, errors = filecmp.cmpfiles(direct_dir, daemon_dir, files, shallow=False)
+            assert files == sorted(os.listdir(daemon_dir)) and not mismatch and not errors, (mismatch, errors)
+            identical += len(match)
+    assert started[1:] == [started[0] + 2, started[0] + 1], started  # High priority job overtook the low one
+    return [{"benchmark": "daemon", "jobs": args.jobs, "load_seconds": args.load_seconds,
+             "per_job_load_seconds": direct, "daemon_seconds": warm, "speedup": direct / warm,
+             "identical_files": identical, "priority_order": "ok"}]
+
+# ---- Post-processing ----
+
+def chapter_levels_db(book, process=None):
+    # RMS level of each chapter in dBFS, optionally after running its chunks through `process`
+    levels = []
+    for chunks in book:
+        energy = samples = 0
+        for audio in chunks:
+            audio = process(audio) if process is not None else audio
+            energy += float(np.dot(audio, audio))
+            samples += len(audio)
+        levels.append(10 * np.log10(energy / samples))
+    return np.array(levels)
+
+def check_postprocessed_render(output_dir, sample_rate, tail_samples):
+    # Seek indexes of a post-processed render must still match the audio on disk, chunk for chunk,
+    # with every chapter ending in its closing silence
+    chunks = 0
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith("_index.json"):
+            continue
+        index = read_index(os.path.join(output_dir, name))
+        info = sf.info(os.path.join(output_dir, index["file"]))
+        assert info.samplerate == index["sample_rate"] == sample_rate and info.frames == index["samples"], name
+        position = 0
+        for chapter in index["chapters"]:
+            assert chapter["start"] == position
+            for start, samples, text in chapter["chunks"]:
+                assert start == position
+                position += samples
+            assert chapter["chunks"][-1][2] is None and abs(chapter["chunks"][-1][1] - tail_samples) <= 1
+            chunks += len(chapter["chunks"])
+        assert position == index["samples"], name
+    return chunks
+
+def bench_dsp(args):
+    # Post-processing throughput on one core over kokoro-shaped chunks (uneven silence, a different
+    # level per chapter): a warm-up pass, a timed pass and a pass under tracemalloc, which must show
+    # no per-chunk allocations. Then a small render through generate_audio_segments, checking that
+    # the seek index still lines up with the processed audio and that a resumed render is identical
+    book = synthetic_chunks(args.chapters, args.chunks_per_chapter)
+    input_seconds = sum(len(audio) for chunks in book for audio in chunks) / SAMPLE_RATE
+    input_levels = chapter_levels_db(book)
+    rows = []
+    for mode, options in (("trim + level", {}), (f"trim + level + {args.output_rate} Hz", {"output_rate": args.output_rate})):
+        processor = AudioPostProcessor(**options)
+
+        def run():
+            output_samples = 0
+            for chunks in book:
+                processor.start_chapter()
+                for audio in chunks:
+                    output_samples += len(processor.process(audio))
+                output_samples += len(processor.end_chapter())
+            return output_samples
+
+        output_levels = chapter_levels_db(book, processor.process)  # Warm-up pass
+        seconds, output_samples = timed(run)
+        peak = peak_memory(run)
+        rows.append({"benchmark": "dsp", "mode": mode, "audio_hours": input_seconds / 3600, "seconds": seconds,
+                     "x_realtime": input_seconds / seconds, "output_hours": output_samples / processor.sample_rate / 3600,
+                     "level_spread_db_in": np.ptp(input_levels), "level_spread_db_out": np.ptp(output_levels),
+                     "peak_alloc_kib": peak / 1024})
+        assert peak < 64 * 1024, peak  # Buffers are reused: only a few Python objects per call
+
+    titles, chapters = synthetic_book(args.render_chapters * 5 / 60, chapter_minutes=5)
+    with tempfile.TemporaryDirectory() as work_dir:
+        plain = render_quietly(os.path.join(work_dir, "plain"), titles, chapters, load_pipeline=FakePipeline)
+        for output_rate in (None, args.output_rate):
+            processor = AudioPostProcessor(output_rate=output_rate)
+            output_dir = os.path.join(work_dir, str(output_rate))
+            seconds = render_quietly(output_dir, titles, chapters, load_pipeline=FakePipeline, postprocess=processor,
+                                     chapters_per_segment=2)
+            chunks = check_postprocessed_render(output_dir, processor.sample_rate,
+                                                processor.tail * processor.sample_rate / SAMPLE_RATE)
+
+            # A segment rendered on its own (the others skipped by the manifest) must match the full render
+            resumed_dir = os.path.join(work_dir, f"{output_rate}-resumed")
+            shutil.copytree(output_dir, resumed_dir)
+            segment_files = sorted(name for name in os.listdir(output_dir) if name.endswith(".wav"))
+            os.remove(os.path.join(resumed_dir, segment_files[len(segment_files) // 2]))
+            render_quietly(resumed_dir, titles, chapters, load_pipeline=FakePipeline,
+                           postprocess=AudioPostProcessor(output_rate=output_rate), chapters_per_segment=2)
+            files = sorted(name for name in os.listdir(output_dir) if name != "manifest.json")
+            match, mismatch, errors = filecmp.cmpfiles(output_dir, resumed_dir, files, shallow=False)
+            assert not mismatch and not errors, (mismatch, errors)
+            rows.append({"benchmark": "dsp render", "sample_rate": processor.sample_rate, "chapters": len(chapters),
+                         "segments": len(segment_files), "plain_seconds": plain, "seconds": seconds,
+                         "indexed_chunks": chunks, "identical_after_resume": len(match)})
+    return rows
+
+# ---- Scraping ----
+
+def bench_scrape(args):
+    # HTTP fast-path throughput against a local fixture site (no browser, no network)
+    from http_scraper import scrape_chapters_http
+    from text_scraper import split_scraped_chapters
+    titles, chapters = synthetic_book(args.chapters * args.chapter_minutes / 60, chapter_minutes=args.chapter_minutes)
+    pages = with_headerless_pages(chapters)
+    server, url = serve_fixture_book(pages, latency=args.latency)
+    try:
+        seconds, scraped = timed(lambda: list(scrape_chapters_http(
+            url, *FIXTURE_SELECTORS, requests_per_second=args.requests_per_second, js_fallback=False)))
+    finally:
+        server.shutdown()
+    assert len(scraped) == len(pages), (len(scraped), len(pages))
+    assert scraped[1][0].startswith("Book 1 and Chapter 1 ")
+    assert scraped[1][1].split("\n\n", 1)[1].splitlines() == chapters[0].splitlines()[1:]  # One line per paragraph
+    # Text outside <p> (divs, bare text, tables) is kept too, a line per block like a browser renders it
+    from bs4 import BeautifulSoup
+    from http_scraper import element_text
+    mixed = BeautifulSoup("<div><p>First para.</p><div>Div para.</div>Bare text<br>line two<table><tr><td>HP: 100</td>"
+                          "<td>MP: 5</td></tr></table><p>Last.</p></div>", "html.parser").div
+    assert element_text(mixed) == "First para.\nDiv para.\nBare text\nline two\nHP: 100 MP: 5\nLast.", element_text(mixed)
+    # --stream splits the pages exactly like the book.txt they are saved to: the Prelude is a chapter
+    # of its own and the Interlude belongs to the chapter before it
+    split = list(split_scraped_chapters(scraped))
+    assert [title for title, chapter_text in split] == ["Prelude"] + titles
+    assert split == saved_book_chapters(scraped)
+    return [{"benchmark": "scrape", "chapters": len(scraped), "latency": args.latency, "seconds": seconds,
+             "chapters_per_s": len(scraped) / seconds}]
+
+def saved_book_chapters(scraped):
+    # (title, chapter_text) pairs iter_book reads from the book.txt save_chapters writes for `scraped`
+    from chapter_store import DIVIDER
+    with tempfile.TemporaryDirectory() as work_dir:
+        book_path = os.path.join(work_dir, "book.txt")
+        with open(book_path, "w", encoding="utf-8") as book_file:
+            for formatted_title, cleaned_text in scraped:
+                book_file.write(cleaned_text + "\n\n" + DIVIDER + "\n\n")
+        return list(iter_book(book_path))
+
+def bench_store(args):
+    # Chapter library vs book.txt on a serial that keeps growing: a full scrape, an incremental
+    # scrape after new chapters go up, and reading a chapter range from the library vs parsing
+    # the whole book.txt (both must give the same chapters, headerless Prelude and Interlude pages included)
+    from chapter_store import ChapterStore, DIVIDER
+    from text_scraper import update_book
+    titles, chapters = synthetic_book(args.chapters * args.chapter_minutes / 60, chapter_minutes=args.chapter_minutes)
+    pages = with_headerless_pages(chapters)
+    published = pages[:len(pages) - args.new_chapters]  # What the site shows at first
+    server, url = serve_fixture_book(published, latency=args.latency)
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = ChapterStore(os.path.join(work_dir, "library.sqlite3"))
+        try:
+            for run in ("full", "incremental"):
+                if run == "incremental":
+                    published.extend(pages[len(published):])  # New chapters are posted
+                server.requests = 0
+                seconds, fetched = timed(lambda: list(update_book(store, "fixture", url, *FIXTURE_SELECTORS, engine="http",
+                                                                  requests_per_second=0, js_fallback=False)))
+                rows.append({"benchmark": "store", "operation": f"{run} scrape", "chapters": sum(chapter[-1] for chapter in fetched),
+                             "pages": server.requests, "seconds": seconds})
+        finally:
+            server.shutdown()
+        assert store.last_chapter("fixture")[0] == len(pages)
+
+        book_path = os.path.join(work_dir, "book.txt")
+        with open(book_path, "w", encoding="utf-8") as book_file:  # What save_chapters would have written
+            for title, cleaned_text in store.chapters("fixture"):
+                book_file.write(cleaned_text + "\n\n" + DIVIDER + "\n\n")
+        first, last = len(pages) - args.range_chapters + 1, len(pages)
+
+        def parse_book_txt():
+            # What render_book does: clean and split the whole file, keeping only the range
+            # (the last range_chapters chapters; the Interlude merged earlier, so numbers differ from the library's)
+            ordered_titles, ordered_chapters = [], []
+            for title, chapter_text in iter_book(book_path):
+                ordered_titles.append(title)
+                ordered_chapters.append(chapter_text)
+            return ordered_titles[-args.range_chapters:], ordered_chapters[-args.range_chapters:]
+
+        parse_seconds, parsed = timed(parse_book_txt)
+        query_seconds, queried = timed(store.titles_and_chapters, "fixture", first, last)
+        def same_chapters(a, b):
+            # Equal titles and equal text up to whitespace the TTS cache and manifest ignore as well
+            return a[0] == b[0] and [normalize_text(text) for text in a[1]] == [normalize_text(text) for text in b[1]]
+
+        assert same_chapters(parsed, queried)
+        whole = store.titles_and_chapters("fixture")  # The headerless pages are in here
+        assert whole[0] == ["Prelude"] + titles
+        assert same_chapters(whole, tuple(map(list, zip(*iter_book(book_path)))))
+        import_seconds, imported = timed(store.import_book_txt, "imported", book_path)
+        assert same_chapters(store.titles_and_chapters("imported"), whole)
+        assert same_chapters(store.titles_and_chapters("imported", first, last), queried)
+        store.close()
+    rows += [{"benchmark": "store", "operation": "range from book.txt", "chapters": len(parsed[0]), "pages": 0,
+              "seconds": parse_seconds},
+             {"benchmark": "store", "operation": "range from library", "chapters": len(queried[0]), "pages": 0,
+              "seconds": query_seconds},
+             {"benchmark": "store", "operation": "import book.txt", "chapters": imported, "pages": 0,
+              "seconds": import_seconds}]
+    return rows
+
+# ---- Suite ----
+
+def bench_suite(args):
+    # A quick pass over every stage we control, sized to finish in about a minute
+    text_options = {"line_chars": 400, "lines_per_chapter": 200, "decorative_every": 25}
+    return (bench_clean(argparse.Namespace(chapters=200, **text_options))
+            + bench_extract(argparse.Namespace(chapters=200, **text_options))
+            + bench_text(argparse.Namespace(size_mb=20, **text_options))
+            + bench_segments(argparse.Namespace(hours=[1], buffered=False, subtype=None, formats=["wav"], book_formats=[]))
+            + bench_e2e(argparse.Namespace(chapters=30, workers=1, real_time_factor=0.0,
+                                           **dict(text_options, lines_per_chapter=20))))
+
+def print_rows(rows):
+    # One table per benchmark, columns in the order the rows list them
+    for name in dict.fromkeys(row["benchmark"] for row in rows):
+        group = [row for row in rows if row["benchmark"] == name]
+        columns = [column for column in group[0] if column != "benchmark"]
+        cells = [[f"{row[column]:.2f}" if isinstance(row[column], float) else str(row[column]) for column in columns]
+                 for row in group]
+        widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+        print(f"\n{name}")
+        print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+        for line in cells:
+            print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+def git_commit():
+    # Short hash of the checked-out commit, if this is a git checkout
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def save_results(path, args, rows):
+    # Results plus enough context to compare runs across commits and machines
+    arguments = {key: value for key, value in vars(args).items() if key not in ("func", "json", "command")}
+    report = {"command": args.command, "arguments": arguments, "commit": git_commit(),
+              "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+              "results": rows}
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(report, results_file, indent=1)
+
+def add_book_text_arguments(parser):
+    parser.add_argument("--line-chars", type=int, default=400, help="characters per prose line")
+    parser.add_argument("--lines-per-chapter", type=int, default=200, help="lines per chapter")
+    parser.add_argument("--decorative-every", type=int, default=25, help="a decorative line every N lines, 0 for none")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline audiobook pipeline benchmarks")
+    parser.add_argument("--json", metavar="PATH", help="also save results as JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    suite_parser = subparsers.add_parser("suite", help="quick pass over every stage, for tracking regressions")
+    suite_parser.set_defaults(func=bench_suite)
+
+    clean_parser = subparsers.add_parser("clean", help="clean_text throughput, original vs current")
+    clean_parser.add_argument("--chapters", type=int, default=500, help="number of chapters in the book")
+    add_book_text_arguments(clean_parser)
+    clean_parser.set_defaults(func=bench_clean)
+
+    extract_parser = subparsers.add_parser("extract", help="extract_chapters_and_titles throughput, original vs current")
+    extract_parser.add_argument("--chapters", type=int, default=500, help="number of chapters in the book")
+    add_book_text_arguments(extract_parser)
+    extract_parser.set_defaults(func=bench_extract)
+
+    text_parser = subparsers.add_parser("text", help="book.txt clean/split throughput and memory, whole-file vs streaming")
+    text_parser.add_argument("--size-mb", type=float, default=100, help="size of the synthetic book.txt")
+    add_book_text_arguments(text_parser)
+    text_parser.set_defaults(func=bench_text)
+
+    segments_parser = subparsers.add_parser("segments", help="segment writing speed and peak memory over a synthetic book")
+    segments_parser.add_argument("--hours", type=float, nargs="+", default=[1, 4, 8], help="book lengths to render")
+    segments_parser.add_argument("--subtype", default=None, help="soundfile subtype, e.g. PCM_16 or PCM_24; defaults to the format's own")
+    segments_parser.add_argument("--formats", nargs="+", choices=sorted(SEGMENT_FORMATS), default=["wav"],
+                                 help="segment formats to compare, e.g. wav flac opus")
+    segments_parser.add_argument("--book-formats", nargs="*", choices=sorted(BOOK_FORMATS), default=sorted(BOOK_FORMATS),
+                                 help="also render these single-file book formats through ffmpeg (skipped without ffmpeg)")
+    segments_parser.add_argument("--buffered", action="store_true", help="also measure the old buffer-per-segment writer")
+    segments_parser.set_defaults(func=bench_segments)
+
+    cache_parser = subparsers.add_parser("cache", help="cold, warm and edited re-renders through the TTS cache")
+    cache_parser.add_argument("--chapters", type=int, default=500, help="number of chapters in the book")
+    cache_parser.add_argument("--chapter-minutes", type=float, default=1, help="spoken length of each chapter")
+    cache_parser.add_argument("--commit-entries", type=int, default=2000, help="entries committed when timing commits")
+    cache_parser.set_defaults(func=bench_cache)
+
+    parallel_parser = subparsers.add_parser("parallel", help="serial vs worker-pool rendering, checking identical output")
+    parallel_parser.add_argument("--chapters", type=int, default=24, help="number of chapters in the book")
+    parallel_parser.add_argument("--chapter-minutes", type=float, default=2, help="spoken length of each chapter")
+    parallel_parser.add_argument("--workers", type=int, default=max(2, os.cpu_count()),
+                                 help="worker processes (at least 2, so the pool is always exercised)")
+    parallel_parser.add_argument("--real-time-factor", type=float, default=0.02, help="fake model cost per audio second")
+    parallel_parser.set_defaults(func=bench_parallel)
+
+    e2e_parser = subparsers.add_parser("e2e", help="main.py render flow from book.txt to segments, cold and rerun")
+    e2e_parser.add_argument("--chapters", type=int, default=100, help="number of chapters in the book")
+    e2e_parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    e2e_parser.add_argument("--real-time-factor", type=float, default=0.0, help="fake model cost per audio second")
+    add_book_text_arguments(e2e_parser)
+    e2e_parser.set_defaults(func=bench_e2e)
+
+    packing_parser = subparsers.add_parser("packing", help="chapter-count vs duration-targeted segments, checking seek indexes")
+    packing_parser.add_argument("--hours", type=float, default=12, help="length of the synthetic book")
+    packing_parser.add_argument("--chapter-minutes", type=float, nargs="+", default=[4, 45, 12, 2, 90, 20, 7],
+                                help="chapter lengths, used in turn")
+    packing_parser.add_argument("--chapters-per-segment", type=int, default=10, help="fixed segment size to compare with")
+    packing_parser.add_argument("--segment-minutes", type=float, default=60, help="target segment length")
+    packing_parser.set_defaults(func=bench_packing)
+
+    chunking_parser = subparsers.add_parser("chunking", help="whole-chapter pipeline calls vs sentence units vs batched units")
+    chunking_parser.add_argument("--chapters", type=int, default=4, help="number of chapters in the book")
+    chunking_parser.add_argument("--lines-per-chapter", type=int, default=150, help="dialogue and prose lines per chapter")
+    chunking_parser.add_argument("--unit-chars", type=int, default=350, help="unit size for the chunker")
+    chunking_parser.add_argument("--batch-size", type=int, default=8, help="units per batched call")
+    chunking_parser.add_argument("--call-seconds", type=float, default=0.03, help="fake model cost per call")
+    chunking_parser.add_argument("--real-time-factor", type=float, default=0.005, help="fake model cost per audio second")
+    chunking_parser.set_defaults(func=bench_chunking)
+
+    daemon_parser = subparsers.add_parser("daemon", help="warm TTS daemon vs a pipeline load per job, with an integration check")
+    daemon_parser.add_argument("--jobs", type=int, default=10, help="small books rendered one after another")
+    daemon_parser.add_argument("--chapters", type=int, default=3, help="chapters per book")
+    daemon_parser.add_argument("--chapter-minutes", type=float, default=2, help="spoken length of each chapter")
+    daemon_parser.add_argument("--load-seconds", type=float, default=1.0, help="fake model load time")
+    daemon_parser.set_defaults(func=bench_daemon)
+
+    dsp_parser = subparsers.add_parser("dsp", help="streaming post-processing throughput and allocations, with a render check")
+    dsp_parser.add_argument("--chapters", type=int, default=8, help="chapters of synthetic chunks")
+    dsp_parser.add_argument("--chunks-per-chapter", type=int, default=40, help="chunks per chapter")
+    dsp_parser.add_argument("--output-rate", type=int, default=44100, help="sample rate for the resampling pass")
+    dsp_parser.add_argument("--render-chapters", type=int, default=6, help="chapters in the render check")
+    dsp_parser.set_defaults(func=bench_dsp)
+
+    scrape_parser = subparsers.add_parser("scrape", help="HTTP scraper throughput against a local fixture site")
+    scrape_parser.add_argument("--chapters", type=int, default=200, help="number of chapters served")
+    scrape_parser.add_argument("--chapter-minutes", type=float, default=15, help="spoken length of each chapter")
+    scrape_parser.add_argument("--latency", type=float, default=0.02, help="simulated per-request latency in seconds")
+    scrape_parser.add_argument("--requests-per-second", type=float, default=0, help="per-host rate limit, 0 for none")
+    scrape_parser.set_defaults(func=bench_scrape)
+
+    store_parser = subparsers.add_parser("store", help="chapter library: incremental scraping and range reads vs book.txt")
+    store_parser.add_argument("--chapters", type=int, default=300, help="chapters on the site after the update")
+    store_parser.add_argument("--new-chapters", type=int, default=10, help="chapters posted between the two scrapes")
+    store_parser.add_argument("--chapter-minutes", type=float, default=15, help="spoken length of each chapter")
+    store_parser.add_argument("--range-chapters", type=int, default=50, help="chapters in the range read")
+    store_parser.add_argument("--latency", type=float, default=0.02, help="simulated per-request latency in seconds")
+    store_parser.set_defaults(func=bench_store)
+
+    args = parser.parse_args()
+    rows = args.func(args)
+    print_rows(rows)
+    if args.json:
+        save_results(args.json, args, rows)
+        print(f"\nResults saved to {args.json}")
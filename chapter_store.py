@@ -0,0 +1,148 @@
+# chapter_store.py
+import hashlib  # For chapter content hashes
+import os  # For the library path
+import sqlite3  # Single-file chapter library
+import threading  # Scrapers may write from a background thread
+import time  # For scrape timestamps
+from text_scraper import split_scraped_chapters  # Same chapter splitting as the streaming render path
+
+DIVIDER = "=" * 80  # Chapter divider in book.txt, see text_scraper.save_chapters
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    url TEXT
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    number INTEGER NOT NULL,
+    url TEXT,
+    title TEXT NOT NULL,
+    raw_title TEXT,
+    raw_text TEXT,
+    cleaned_text TEXT NOT NULL,
+    raw_hash TEXT,
+    cleaned_hash TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (book_id, number)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS chapters_by_url ON chapters (book_id, url);
+"""
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None
+
+class ChapterStore:
+    # A library of scraped books in one SQLite file. Each chapter is stored under
+    # (book, chapter number) with its source URL, the raw title and text as scraped, the
+    # cleaned text ready for TTS and hashes of both. Scrapes only add or update the
+    # chapters they fetch, and renders read just the chapter range they need.
+
+    def __init__(self, path=os.path.join("book", "library.sqlite3")):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # Readers don't block the scraper
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()  # One connection shared across threads
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _book_id(self, book):
+        row = self.connection.execute("SELECT id FROM books WHERE name = ?", (book,)).fetchone()
+        if row is None:
+            raise KeyError(f"No book named {book!r} in {self.path}")
+        return row[0]
+
+    def add_book(self, book, url=None):
+        # Register a book (or update its start URL); adding an existing book is a no-op otherwise
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO books (name, url) VALUES (?, ?) "
+                                    "ON CONFLICT(name) DO UPDATE SET url = COALESCE(excluded.url, url)", (book, url))
+
+    def books(self):
+        # [(name, start url, chapter count)] for every book in the library
+        with self.lock:
+            return self.connection.execute(
+                "SELECT name, url, (SELECT COUNT(*) FROM chapters WHERE book_id = books.id) FROM books ORDER BY name"
+            ).fetchall()
+
+    def last_chapter(self, book):
+        # (number, url) of the newest stored chapter, or None for an empty or unknown book
+        with self.lock:
+            return self.connection.execute(
+                "SELECT number, chapters.url FROM chapters JOIN books ON books.id = book_id "
+                "WHERE books.name = ? ORDER BY number DESC LIMIT 1", (book,)).fetchone()
+
+    def put_chapter(self, book, number, url, title, cleaned_text, raw_title=None, raw_text=None):
+        # Insert or update one chapter; returns True if anything about it changed
+        raw_hash, cleaned_hash = content_hash(raw_text), content_hash(cleaned_text)
+        with self.lock, self.connection:
+            book_id = self._book_id(book)
+            stored = self.connection.execute(
+                "SELECT url, title, raw_hash, cleaned_hash FROM chapters WHERE book_id = ? AND number = ?",
+                (book_id, number)).fetchone()
+            if stored == (url, title, raw_hash, cleaned_hash):
+                return False
+            if url is not None:  # A URL that moved to another chapter number no longer belongs to the old one
+                self.connection.execute("DELETE FROM chapters WHERE book_id = ? AND url = ? AND number != ?",
+                                        (book_id, url, number))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO chapters (book_id, number, url, title, raw_title, raw_text, cleaned_text, "
+                "raw_hash, cleaned_hash, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (book_id, number, url, title, raw_title, raw_text, cleaned_text, raw_hash, cleaned_hash, time.time()))
+            return True
+
+    def chapters(self, book, first=1, last=None, batch_size=64):
+        # Yield (title, cleaned_text) for chapters first..last (inclusive, None for the end), in order,
+        # reading batch_size rows at a time so long books are never loaded whole
+        number = first - 1
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT number, title, cleaned_text FROM chapters JOIN books ON books.id = book_id "
+                    "WHERE books.name = ? AND number > ? AND number <= ? ORDER BY number LIMIT ?",
+                    (book, number, last if last is not None else 2**62, batch_size)).fetchall()
+            for number, title, cleaned_text in rows:
+                yield title, cleaned_text
+            if len(rows) < batch_size:
+                return
+
+    def render_chapters(self, book, first=1, last=None):
+        # (title, chapter_text) pairs for a chapter range, split and named as iter_book splits book.txt:
+        # a stored page without a chapter header continues the chapter before it
+        return split_scraped_chapters(self.chapters(book, first, last))
+
+    def titles_and_chapters(self, book, first=1, last=None):
+        # Drop-in for extract_chapters_and_titles over a chapter range: (ordered_titles, ordered_chapters)
+        ordered_titles, ordered_chapters = [], []
+        for title, chapter_text in self.render_chapters(book, first, last):
+            ordered_titles.append(title)
+            ordered_chapters.append(chapter_text)
+        return ordered_titles, ordered_chapters
+
+    def import_book_txt(self, book, book_path=os.path.join("book", "book.txt")):
+        # Load a book.txt written by save_chapters into the library; returns the number of chapters.
+        # Source URLs and raw text were never saved there, so the next scrape starts from the book's URL
+        self.add_book(book)
+        number = 0
+        block = []
+        with open(book_path, "r", encoding="utf-8") as book_file:
+            for line in book_file:
+                if line.rstrip("\n") != DIVIDER:
+                    block.append(line)
+                    continue
+                cleaned_text = "".join(block).strip("\n")
+                block = []
+                if cleaned_text:
+                    number += 1
+                    self.put_chapter(book, number, None, cleaned_text.split("\n", 1)[0], cleaned_text)
+        return number
@@ -0,0 +1,198 @@
+# http_scraper.py
+import re  # For collapsing source whitespace
+import threading  # For the shared per-host rate limiter
+import time  # For rate limiting
+from concurrent.futures import ThreadPoolExecutor  # For concurrent page fetches and parsing
+from urllib.parse import urljoin, urlparse  # For resolving next-chapter links
+import requests  # Pooled HTTP client
+from requests.adapters import HTTPAdapter  # Connection pool sizing and retries
+from bs4 import BeautifulSoup  # HTML parser with CSS selector support
+from bs4.element import NavigableString, PreformattedString  # Text nodes, and comments/doctypes among them
+from text_scraper import format_chapter  # Same title normalization and cleaning as the browser path
+from streaming import iter_in_background  # Runs the link walk ahead of the consumer
+
+# Elements rendered on lines of their own
+BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "ul", "ol", "dl", "dt", "dd", "blockquote",
+              "pre", "table", "caption", "thead", "tbody", "tfoot", "tr", "hr", "section", "article", "header",
+              "footer", "aside", "nav", "main", "figure", "figcaption", "address", "details", "summary", "center"}
+CELL_TAGS = {"td", "th"}  # Table cells, rendered side by side with a space between them
+HIDDEN_TAGS = {"script", "style", "template", "noscript", "head", "title"}  # Never rendered
+HTML_WHITESPACE = re.compile(r"[ \t\n\r\f]+")  # What a browser collapses (not &nbsp;)
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+class HostRateLimiter:
+    # Spaces out requests to the same host by at least 1 / requests_per_second seconds
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_allowed = {}  # host -> earliest time for the next request
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:  # Reserve a slot, then sleep outside the lock
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def make_session(pool_size):
+    # One keep-alive connection pool shared by every fetch
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+def rendered_pieces(node, preformatted=False):
+    # (kind, text) for everything under `node` in document order: "text" runs, "pre" runs that keep
+    # their whitespace, and "br", "block" and "cell" boundaries
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            if not isinstance(child, PreformattedString):  # Skip comments, CDATA and doctypes
+                yield "pre" if preformatted else "text", str(child)
+        elif child.name == "br":
+            yield "br", ""
+        elif child.name in HIDDEN_TAGS:
+            continue
+        elif child.name in BLOCK_TAGS:
+            yield "block", ""
+            yield from rendered_pieces(child, preformatted or child.name == "pre")
+            yield "block", ""
+        else:
+            if child.name in CELL_TAGS:
+                yield "cell", ""
+            yield from rendered_pieces(child, preformatted)
+
+def element_text(element):
+    # Approximate Selenium's rendered .text: every text node is kept, runs of source whitespace
+    # (including its line wrapping) become one space, block elements start and end lines, <br>
+    # breaks lines, table cells are separated by spaces and <pre> keeps its whitespace
+    lines, line = [], ""
+    for kind, text in rendered_pieces(element):
+        if kind == "text":
+            text = HTML_WHITESPACE.sub(" ", text)
+            line += text.lstrip(" ") if not line or line.endswith(" ") else text
+        elif kind == "pre":
+            first, *rest = text.split("\n")
+            line += first
+            for part in rest:
+                lines.append(line.rstrip(" "))
+                line = part
+        elif kind == "cell":
+            if line and not line.endswith(" "):
+                line += " "
+        elif kind == "br" or line.strip():  # Blocks only break lines that have something on them
+            lines.append(line.rstrip(" "))
+            line = ""
+    lines.append(line.rstrip(" "))
+    return "\n".join(lines).strip("\n")
+
+class SeleniumFallback:
+    # Renders pages whose content only appears after JavaScript runs; the browser is
+    # started on first use and shared by all fallback pages
+
+    def __init__(self):
+        self.driver = None
+        self.lock = threading.Lock()  # One browser, one page at a time
+
+    def fetch(self, url, title_selector, content_selector, next_button_selector):
+        from selenium import webdriver  # Only loaded if some page actually needs a browser
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import NoSuchElementException
+
+        with self.lock:
+            if self.driver is None:
+                options = Options()
+                options.add_argument("--headless")
+                options.add_argument("--disable-gpu")
+                options.add_argument("--window-size=1920,1080")
+                self.driver = webdriver.Chrome(options=options)
+            self.driver.get(url)
+            time.sleep(1)  # Wait for the page to fully load
+            try:
+                title = self.driver.find_element(By.CSS_SELECTOR, title_selector).text
+                content = self.driver.find_element(By.CSS_SELECTOR, content_selector).text
+            except NoSuchElementException:
+                return None  # Not a chapter page even after rendering
+            try:
+                next_url = self.driver.find_element(By.CSS_SELECTOR, next_button_selector).get_attribute("href")
+            except NoSuchElementException:
+                next_url = None
+            return title, content, next_url
+
+    def close(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+def scrape_pages_http(url, title_selector, content_selector, next_button_selector,
+                      prefetch=8, requests_per_second=4.0, pool_size=4, js_fallback=True, max_chapters=None,
+                      process=None):
+    # Walk the book over plain HTTP, yielding (page_url, title, content) like
+    # text_scraper.scrape_pages, or process(page_url, title, content) if given. Next links are followed by reading their href, so the
+    # walk never waits on a browser or a fixed sleep. Pages along the chain have to be
+    # fetched one after another, but the walk runs on its own thread up to `prefetch`
+    # chapters ahead of the consumer while a pool extracts text (and runs `process`), and requests
+    # to each host are rate limited. Pages missing the title or content in their static
+    # HTML are rendered with Selenium instead.
+    session = make_session(pool_size)
+    limiter = HostRateLimiter(requests_per_second)
+    fallback = SeleniumFallback() if js_fallback else None
+
+    def fetch(page_url):
+        limiter.wait(page_url)
+        response = session.get(page_url, timeout=30)
+        response.raise_for_status()
+        return response.text
+
+    def parse(page_url, html):
+        # Returns (title, content element or text, next_url), or None for a non-chapter page
+        soup = BeautifulSoup(html, "html.parser")
+        title_elem = soup.select_one(title_selector)
+        content_elem = soup.select_one(content_selector)
+        next_elem = soup.select_one(next_button_selector)
+        next_url = urljoin(page_url, next_elem["href"]) if next_elem is not None and next_elem.get("href") else None
+        if title_elem is None or content_elem is None:
+            if fallback is None:
+                return None
+            return fallback.fetch(page_url, title_selector, content_selector, next_button_selector)
+        return element_text(title_elem), content_elem, next_url
+
+    def extract(page_url, title, content):
+        if not isinstance(content, str):  # Static HTML still needs its text pulled out
+            content = element_text(content)
+        return process(page_url, title, content) if process is not None else (page_url, title, content)
+
+    def walk(pool):
+        # Follow next links, handing each chapter's text extraction to the pool
+        seen = set()  # Guards against next links that loop back
+        page_url = url
+        while page_url and page_url not in seen and (max_chapters is None or len(seen) < max_chapters):
+            seen.add(page_url)
+            page = parse(page_url, fetch(page_url))
+            if page is None:
+                break  # No more content
+            title, content, next_url = page
+            yield pool.submit(extract, page_url, title, content)
+            page_url = next_url
+
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        chapters = iter_in_background(walk(pool), maxsize=prefetch)  # Bounded read-ahead
+        try:
+            for future in chapters:
+                yield future.result()
+        finally:
+            chapters.close()
+            session.close()
+            if fallback is not None:
+                fallback.close()
+
+def scrape_chapters_http(url, title_selector, content_selector, next_button_selector, **options):
+    # Walk the book over plain HTTP, yielding (formatted_title, cleaned_text) like
+    # text_scraper.scrape_chapters; chapters are cleaned on the extraction pool
+    return scrape_pages_http(url, title_selector, content_selector, next_button_selector,
+                             process=lambda page_url, title, content: format_chapter(title, content), **options)
@@ -1,28 +1,120 @@
 #!/usr/bin/env python3
-from text_scraper import download_book, clean_text, extract_chapters_and_titles
-from audio_generator import generate_audio_segments
+from text_scraper import download_book, stream_book, split_scraped_chapters, update_book, stream_stored_book
+from chapter_store import ChapterStore
+from text_engine import iter_book
+from audio_generator import generate_audio_stream
+from audio_writer import SEGMENT_FORMATS, BOOK_FORMATS, check_sample_rate
+from audio_dsp import AudioPostProcessor
+from streaming import iter_in_background
+from metrics import RenderMetrics
+from contextlib import closing
+import argparse
 import os
 
+def render_book(book_path=os.path.join("book", "book.txt"), **render_options):
+    # Steps 2 and 3: Stream the downloaded book, cleaning it and splitting it into chapters in one pass
+    metrics = render_options.setdefault("metrics", RenderMetrics())
+    chapters = metrics.timed_iter(iter_book(book_path), "clean")
+
+    # Step 4: Generate audio from chapters
+    generate_audio_stream(chapters, **render_options)
+
+def render_stored_book(store, book, first=1, last=None, **render_options):
+    # Render a chapter range straight from the chapter library, without reading the rest of the book
+    metrics = render_options.setdefault("metrics", RenderMetrics())
+    chapters = metrics.timed_iter(store.render_chapters(book, first, last), "clean")
+    generate_audio_stream(chapters, **render_options)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape a web serial and render it as an audiobook")
+    parser.add_argument("--stream", action="store_true", help="scrape and synthesize concurrently instead of reading book/book.txt")
+    parser.add_argument("--engine", choices=["selenium", "http"], default="selenium", help="how chapters are fetched when scraping")
+    parser.add_argument("--queue-size", type=int, default=8, help="chapters the scraper may run ahead of synthesis")
+    parser.add_argument("--workers", type=int, default=1, help="TTS worker processes")
+    parser.add_argument("--device", default="cuda", help="device for the TTS model, e.g. cuda or cpu")
+    parser.add_argument("--preview", action="store_true", help="print and play every chunk (Jupyter only)")
+    parser.add_argument("--report", default=os.path.join("audio", "render_report.json"), help="per-chapter timing report (.json or .csv)")
+    parser.add_argument("--progress", type=float, default=60, help="seconds between progress lines")
+    parser.add_argument("--format", choices=list(SEGMENT_FORMATS) + list(BOOK_FORMATS), default="wav",
+                        help="segment files (wav, flac, opus, vorbis) or one book file with chapter markers (m4b, mka)")
+    parser.add_argument("--segment-minutes", type=float, default=60, help="target length of each segment file, 0 for no limit")
+    parser.add_argument("--segment-mib", type=float, default=0, help="target size of each segment file, 0 for no limit")
+    parser.add_argument("--chapters-per-segment", type=int, default=0, help="most chapters in one segment file, 0 for no limit")
+    parser.add_argument("--unit-chars", type=int, default=0, help="pack sentences into units of this many characters (e.g. 350) before synthesis; 0 keeps whole chapters")
+    parser.add_argument("--batch-size", type=int, default=1, help="units per pipeline call, across chapters (pipelines with a batch method only)")
+    parser.add_argument("--postprocess", action="store_true", help="trim silence, even out pauses and level loudness while writing")
+    parser.add_argument("--target-db", type=float, default=-20, help="with --postprocess: speech loudness in dB RMS")
+    parser.add_argument("--sample-rate", type=int, default=0, help="with --postprocess: resample the output to this rate, 0 to keep 24000")
+    parser.add_argument("--book", help="use this book in the chapter library instead of book/book.txt")
+    parser.add_argument("--library", default=os.path.join("book", "library.sqlite3"), help="chapter library file")
+    parser.add_argument("--update", action="store_true", help="with --book: scrape chapters newer than the last stored one first")
+    parser.add_argument("--import-book-txt", nargs="?", const=os.path.join("book", "book.txt"), metavar="PATH",
+                        help="with --book: load a book.txt written by an earlier scrape into the library first")
+    parser.add_argument("--first", type=int, default=1, help="with --book: first chapter number to render")
+    parser.add_argument("--last", type=int, help="with --book: last chapter number to render (default: newest)")
+    args = parser.parse_args()
+    if args.sample_rate:
+        try:
+            check_sample_rate(args.format, args.sample_rate)
+        except ValueError as error:
+            parser.error(f"--sample-rate: {error}")
+    metrics = RenderMetrics(progress_interval=args.progress)
+    render_options = {"workers": args.workers, "device": args.device, "preview": args.preview,
+                      "metrics": metrics, "report_path": args.report, "output_format": args.format,
+                      "segment_minutes": args.segment_minutes, "segment_mib": args.segment_mib,
+                      "chapters_per_segment": args.chapters_per_segment,
+                      "unit_chars": args.unit_chars or None, "batch_size": args.batch_size,
+                      "postprocess": AudioPostProcessor(target_db=args.target_db, output_rate=args.sample_rate or None)
+                      if args.postprocess else None}
+
     # Define scraping configuration
     url = "https://www.royalroad.com/fiction/47038/book-of-the-dead/chapter/1224156/b3-prelude"
     title_selector = "div.row.fic-header h1"
     content_selector = "div.chapter-inner.chapter-content"
     next_button_selector = "div.portlet-body > div.row.nav-buttons > div.col-xs-6.col-md-4.col-md-offset-4.col-lg-3.col-lg-offset-6 > a"
 
-    # Step 1: Download and clean the book content
-    #download_book(url, title_selector, content_selector, next_button_selector)
+    if (args.update or args.import_book_txt) and not args.book:
+        parser.error("--update and --import-book-txt need --book")
+    store = ChapterStore(args.library) if args.book else None  # Chapter library, when rendering from one
 
-    # Step 2: Load and clean the downloaded book text
-    book_path = os.path.join("book", "book.txt")
-    with open(book_path, "r", encoding="utf-8") as file:
-        raw_text = file.read()
-    cleaned_text = clean_text(raw_text)
+    if args.stream:
+        # Scrape on a background thread into a bounded queue; cleaning and TTS consume
+        # chapters as they arrive, so the first segment is written while scraping continues.
+        # Chapters are cleaned as they are scraped, so "scrape" time includes cleaning here.
+        # With --book, stored chapters are read from the library and only newer ones are scraped.
+        if store is not None:
+            source = stream_stored_book(store, args.book, url, title_selector, content_selector, next_button_selector, args.engine)
+        else:
+            source = stream_book(url, title_selector, content_selector, next_button_selector, args.engine)
+        scraped = iter_in_background(metrics.timed_iter(source, "scrape"), maxsize=args.queue_size)
+        with closing(scraped):
+            generate_audio_stream(split_scraped_chapters(scraped), **render_options)
+    elif store is not None:
+        # Step 1: Load an existing book.txt and/or fetch only chapters newer than the last one in the library
+        if args.import_book_txt:
+            imported = store.import_book_txt(args.book, args.import_book_txt)
+            print(f"{imported} chapters imported from {args.import_book_txt} into {args.library}")
+        if args.update:
+            changed = sum(changed for *chapter, changed in update_book(store, args.book, url, title_selector, content_selector, next_button_selector, args.engine))
+            print(f"{changed} new or changed chapters stored in {args.library}")
+        last = store.last_chapter(args.book)
+        if last is None:
+            if args.book not in [name for name, book_url, count in store.books()]:
+                parser.error(f"no book named {args.book!r} in {args.library}; "
+                             "add it with --update (scrape) or --import-book-txt (existing book.txt)")
+            parser.error(f"book {args.book!r} in {args.library} has no chapters yet; fetch them with --update")
+        if args.first > last[0]:
+            parser.error(f"--first {args.first} is past the newest chapter of {args.book!r} ({last[0]})")
+        if args.last is not None and args.last < args.first:
+            parser.error("--last must not come before --first")
 
-    # Step 3: Extract chapter titles and content
-    ordered_titles, ordered_chapters = extract_chapters_and_titles(cleaned_text)
+        # Steps 2 to 4: Synthesize the requested chapters straight from the library
+        render_stored_book(store, args.book, args.first, args.last, **render_options)
+    else:
+        # Step 1: Download and clean the book content
+        #download_book(url, title_selector, content_selector, next_button_selector, args.engine)
 
-    # Step 4: Generate audio from chapters
-    generate_audio_segments(ordered_titles, ordered_chapters)
+        # Steps 2 to 4: Clean, split and synthesize the downloaded book
+        render_book(**render_options)
 
     print("Processing complete. Audio files saved to ./audio/")
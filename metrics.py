@@ -0,0 +1,106 @@
+# metrics.py
+import csv  # For CSV reports
+import json  # For JSON reports
+import threading  # Stages may report from producer threads
+import time  # For stage timing
+
+STAGES = ("scrape", "clean", "synth", "write")  # Per-chapter stages, in pipeline order
+
+class RenderMetrics:
+    # Collects per-chapter, per-stage wall-clock times for a render and turns them into
+    # a JSON/CSV report and optional periodic progress lines. Chapters are numbered in
+    # the order they flow through the pipeline, starting at 1.
+
+    def __init__(self, progress_interval=None, on_chapter=None):
+        self.progress_interval = progress_interval  # Seconds between progress lines, None for none
+        self.on_chapter = on_chapter  # Called with a copy of each finished chapter's row, e.g. to stream progress
+        self.started = time.perf_counter()
+        self.last_progress = self.started
+        self.chapters = {}  # number -> row
+        self.lock = threading.Lock()
+
+    def _row(self, number):
+        row = self.chapters.get(number)
+        if row is None:
+            row = {"chapter": number, "title": None, "chars": 0, "audio_seconds": 0.0}
+            row.update({f"{stage}_seconds": 0.0 for stage in STAGES})
+            self.chapters[number] = row
+        return row
+
+    def add(self, number, stage, seconds):
+        with self.lock:
+            self._row(number)[f"{stage}_seconds"] += seconds
+
+    def timed_iter(self, iterable, stage):
+        # Pass items through, charging the time spent producing the n-th item to chapter n
+        iterator = iter(iterable)
+        number = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                number += 1
+                self.add(number, stage, time.perf_counter() - start)
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:  # Keep shutdown of upstream stages working
+                close()
+
+    def finish_chapter(self, number, title, chars, audio_seconds, synth_seconds, write_seconds):
+        with self.lock:
+            row = self._row(number)
+            row.update(title=title, chars=chars, audio_seconds=audio_seconds)
+            row["synth_seconds"] += synth_seconds
+            row["write_seconds"] += write_seconds
+            finished = dict(row)
+        if self.on_chapter is not None:
+            self.on_chapter(finished)
+        if self.progress_interval is not None and time.perf_counter() - self.last_progress >= self.progress_interval:
+            self.last_progress = time.perf_counter()
+            print(self.progress_line())
+
+    def rows(self):
+        # One row per rendered chapter, with derived throughput figures
+        with self.lock:
+            rows = [dict(row) for number, row in sorted(self.chapters.items()) if row["title"] is not None]
+        for row in rows:
+            synth = row["synth_seconds"]
+            row["chars_per_second"] = row["chars"] / synth if synth else None
+            row["real_time_factor"] = synth / row["audio_seconds"] if row["audio_seconds"] else None  # < 1 is faster than real time
+        return rows
+
+    def summary(self):
+        rows = self.rows()
+        totals = {f"{stage}_seconds": sum(row[f"{stage}_seconds"] for row in rows) for stage in STAGES}
+        chars = sum(row["chars"] for row in rows)
+        audio = sum(row["audio_seconds"] for row in rows)
+        return {"chapters": len(rows), "chars": chars, "audio_seconds": audio,
+                "wall_seconds": time.perf_counter() - self.started, **totals,
+                "chars_per_second": chars / totals["synth_seconds"] if totals["synth_seconds"] else None,
+                "real_time_factor": totals["synth_seconds"] / audio if audio else None}
+
+    def progress_line(self):
+        summary = self.summary()
+        minutes, seconds = divmod(int(summary["wall_seconds"]), 60)
+        line = f"[{minutes:d}:{seconds:02d}] {summary['chapters']} chapters, {summary['audio_seconds'] / 3600:.2f} h audio"
+        if summary["real_time_factor"] is not None:
+            line += f", {summary['chars_per_second']:.0f} chars/s, RTF {summary['real_time_factor']:.3f}"
+        return line
+
+    def write_report(self, path):
+        # JSON report (summary plus chapters), or CSV of the chapter rows if path ends in .csv
+        rows = self.rows()
+        if path.endswith(".csv"):
+            columns = ["chapter", "title", "chars", "audio_seconds"] + [f"{stage}_seconds" for stage in STAGES] + [
+                "chars_per_second", "real_time_factor"]
+            with open(path, "w", newline="", encoding="utf-8") as report_file:
+                writer = csv.DictWriter(report_file, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w", encoding="utf-8") as report_file:
+                json.dump({"summary": self.summary(), "chapters": rows}, report_file, indent=1)
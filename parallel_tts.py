@@ -0,0 +1,55 @@
+# parallel_tts.py
+import multiprocessing  # For a CUDA-safe process start method
+from collections import deque  # For results waiting to be handed back in order
+from concurrent.futures import Future, ProcessPoolExecutor  # Worker processes for synthesis
+import numpy as np  # For shipping audio back to the parent as plain arrays
+
+_worker_pipeline = None  # Pipeline loaded once per worker process
+
+def _init_worker(load_pipeline):
+    global _worker_pipeline
+    _worker_pipeline = load_pipeline()  # Load model and voices once, reuse for every chapter
+
+def _synthesize_chapter(text, voice, speed):
+    # Runs inside a worker: synthesize one chapter and return all of its chunks
+    chunks = []
+    for gs, ps, audio in _worker_pipeline(text, voice=voice, speed=speed):
+        chunks.append((gs, ps, None if audio is None else np.asarray(audio, dtype=np.float32).reshape(-1)))
+    return chunks
+
+def synthesize_in_order(texts, voice, speed, load_pipeline, workers, cached=None, window=None):
+    # Synthesize chapters on a pool of worker processes and yield each chapter's
+    # [(gs, ps, audio), ...] in input order. `load_pipeline` must be picklable (a
+    # module-level function or functools.partial of one). At most `window` chapters
+    # are in flight or waiting to be consumed, which bounds memory use.
+    # If `cached` (a CachedPipeline) is given, cached chapters never reach a worker
+    # and freshly synthesized ones are stored back by the parent.
+    window = window or workers * 2
+    context = multiprocessing.get_context("spawn")  # Fork is unsafe once CUDA is initialized
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(load_pipeline,)) as pool:
+        pending = deque()  # (text, cached chunks or Future) in chapter order
+
+        def next_result():
+            text, result = pending.popleft()
+            if not isinstance(result, Future):
+                return result
+            chunks = result.result()  # Re-raises any worker error in the parent
+            if cached is not None:
+                cached.store(text, voice, speed, chunks)
+            return chunks
+
+        try:
+            for text in texts:
+                chunks = cached.lookup(text, voice, speed) if cached is not None else None
+                if chunks is None:  # Workers are only started once something needs synthesizing
+                    chunks = pool.submit(_synthesize_chapter, text, voice, speed)
+                pending.append((text, chunks))
+                while len(pending) >= window:
+                    yield next_result()
+            while pending:
+                yield next_result()
+        finally:
+            for text, result in pending:  # Abandoned early: don't wait on queued chapters
+                if isinstance(result, Future):
+                    result.cancel()
@@ -0,0 +1,45 @@
+# render_manifest.py
+import hashlib  # For chapter input hashes
+import json  # For the manifest file
+import os  # For manifest and segment paths
+from tts_cache import normalize_text  # Same notion of "unchanged text" as the TTS cache
+
+def chapter_hash(title, chapter_text, settings):
+    # Hash everything that ends up in a chapter's audio or its timestamp entry
+    payload = json.dumps([title, normalize_text(chapter_text), settings])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def write_atomically(path, write):
+    # Write through a temp file and rename, so readers never see a half-written file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as temp_file:
+        write(temp_file)
+    os.replace(temp_path, path)
+
+class RenderManifest:
+    # Records which segment files are complete and which chapter inputs produced them,
+    # so a rerun can skip segments whose chapters are unchanged. Stored as JSON in the
+    # output directory: {segment file: {"chapters": [{"title", "hash", "samples"}, ...]}}
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, "manifest.json")
+        self.segments = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                self.segments = json.load(manifest_file)["segments"]
+
+    def completed_hashes(self, segment_file):
+        # Chapter hashes of a segment that was fully written and is still on disk, else None
+        entry = self.segments.get(segment_file)
+        if entry is None or not os.path.exists(os.path.join(self.output_dir, segment_file)):
+            return None
+        return [chapter["hash"] for chapter in entry["chapters"]]
+
+    def record(self, segment_file, chapters, superseded=()):
+        # chapters: [{"title", "hash", "samples"}, ...] for a segment that has just been published;
+        # superseded: segment files whose chapters it now contains, already deleted from disk
+        for superseded_file in superseded:
+            self.segments.pop(superseded_file, None)
+        self.segments[segment_file] = {"chapters": chapters}
+        write_atomically(self.path, lambda manifest_file: json.dump({"segments": self.segments}, manifest_file, indent=1))
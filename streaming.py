@@ -0,0 +1,56 @@
+# streaming.py
+import queue  # Bounded hand-off between pipeline stages
+import threading  # Runs the producer stage alongside the consumer
+
+_DONE = object()  # Marks the end of the producer's output
+
+class _Failure:
+    # Carries an exception from the producer thread to the consumer
+    def __init__(self, error):
+        self.error = error
+
+def iter_in_background(iterable, maxsize=8):
+    # Drain `iterable` on a background thread into a queue of at most `maxsize` items
+    # and yield them here. A full queue blocks the producer (backpressure); an error in
+    # the producer is re-raised in the consumer; closing this generator (or an error in
+    # the consumer) stops the producer and closes its iterable.
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()  # Set when the consumer goes away
+
+    def put(item):
+        # Block until there is room, but give up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as error:  # Hand any failure to the consumer
+            put(_Failure(error))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:  # e.g. lets the scraper quit its browser
+                close()
+
+    thread = threading.Thread(target=produce, name="producer", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()  # Unblock and stop the producer
+        thread.join()
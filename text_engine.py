@@ -0,0 +1,60 @@
+# text_engine.py
+import re  # For regex pattern matching
+
+# Regex to match lines made entirely of decorative characters (e.g., ===, ---)
+DECORATIVE_PATTERNS = [r'^\s*[=~\-*_\.]{3,}\s*$']
+# Precompiled regex for performance
+compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in DECORATIVE_PATTERNS]
+# Regex to identify chapter titles like "Book 1 and Chapter 2"
+chapter_header_pattern = re.compile(r"^Book (\d+) and Chapter (\d+)")
+# Regex for shorthand chapter codes like B3C12
+shorthand_pattern = re.compile(r'\bB(\d+)(C(\d+))?\b')
+
+def _expand_shorthand(match):
+    return f"Book {match.group(1)}" + (f" and Chapter {match.group(3)}" if match.group(3) else "")
+
+def expand_shorthand(line):
+    # Replace shorthand formats like B3C12 with "Book 3 and Chapter 12"
+    if "B" not in line:  # Cheap check before running the regex
+        return line
+    return shorthand_pattern.sub(_expand_shorthand, line)
+
+def clean_lines(lines):
+    # Drop decorative lines and expand shorthand, one line at a time
+    for line in lines:
+        stripped_line = line.strip()  # Trim whitespace from both ends
+        # Skip lines that match decorative patterns
+        if any(pattern.match(stripped_line) for pattern in compiled_patterns):
+            continue
+        yield expand_shorthand(line)
+
+def untitled_title(line):
+    # Title for text before the first chapter header, made from its first line (the page title
+    # format_chapter puts there, e.g. "Prelude"), so such text doesn't end up as "segment"
+    return re.sub(r"\W+", "_", line).strip("_") or "segment"
+
+def split_chapters(lines):
+    # Group cleaned lines into chapters, yielding (title, chapter_text) as each one ends.
+    # Text before the first chapter header is titled after its first non-blank line.
+    current = []  # Lines of the chapter being collected
+    current_title = None  # Title of the chapter being collected
+
+    for line in lines:
+        match = chapter_header_pattern.match(line) if line.startswith("Book ") else None
+        if match:
+            if current:  # Finish the previous chapter under its own title
+                yield current_title or "segment", "\n".join(current)
+                current = []
+            current_title = f"Book_{match.group(1)}_Chapter_{match.group(2)}"  # Construct title from match
+        elif current_title is None and line.strip():
+            current_title = untitled_title(line)  # Text before any header
+        current.append(line)  # Add line to current chapter content
+
+    if current:  # Catch last chapter after loop ends
+        yield current_title or "segment", "\n".join(current)
+
+def iter_book(path):
+    # Stream (title, chapter_text) pairs out of a book file without loading it whole:
+    # lines are read through the file buffer, cleaned and split in a single pass
+    with open(path, "r", encoding="utf-8") as book_file:
+        yield from split_chapters(clean_lines(line.rstrip("\r\n") for line in book_file))
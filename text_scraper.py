@@ -1,55 +1,61 @@
 # text_scraper.py
 import os  # For file path operations
-import re  # For regex pattern matching
 import time  # For adding delays to let web pages load
-from selenium import webdriver  # Controls the browser
-from selenium.webdriver.chrome.service import Service  # Manages ChromeDriver execution
-from selenium.webdriver.chrome.options import Options  # Sets options for headless browser operation
-from selenium.webdriver.common.by import By  # Provides methods to locate elements
-from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, StaleElementReferenceException  # Exception handling for dynamic pages
-
-# Regex to match lines made entirely of decorative characters (e.g., ===, ---)
-DECORATIVE_PATTERNS = [r'^\s*[=~\-*_\.]{3,}\s*$']
-# Precompiled regex for performance
-compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in DECORATIVE_PATTERNS]
-# Regex to identify chapter titles like "Book 1 and Chapter 2"
-chapter_header_pattern = re.compile(r"^Book (\d+) and Chapter (\d+)")
+from contextlib import closing  # For shutting scrapers down when a consumer stops early
+from text_engine import clean_lines, split_chapters, expand_shorthand  # Single-pass text engine
 
 def clean_text(text):
-    cleaned_lines = []  # Will store the cleaned version of the text
-    for line in text.splitlines():  # Iterate through each line of the input text
-        stripped_line = line.strip()  # Trim whitespace from both ends
-        # Skip lines that match decorative patterns
-        if any(pattern.match(stripped_line) for pattern in compiled_patterns):
-            continue
-        # Replace shorthand formats like B3C12 with "Book 3 and Chapter 12"
-        line = re.sub(r'\bB(\d+)(C(\d+))?\b', lambda m: f"Book {m.group(1)}" + (f" and Chapter {m.group(3)}" if m.group(3) else ""), line)
-        cleaned_lines.append(line)  # Keep the cleaned line
-    return "\n".join(cleaned_lines)  # Return full cleaned text as one string
+    # Remove decorative lines and expand shorthand in a whole text at once
+    return "\n".join(clean_lines(text.splitlines()))  # Return full cleaned text as one string
 
 def extract_chapters_and_titles(text):
     ordered_titles = []  # List of chapter titles
     ordered_chapters = []  # List of chapter text blocks
-    current = []  # Temporarily holds lines for the current chapter
-    current_title = None  # Will store the current chapter's title
-
-    for line in text.splitlines():
-        match = chapter_header_pattern.match(line)  # Try to match chapter header
-        if match:
-            current_title = f"Book_{match.group(1)}_Chapter_{match.group(2)}"  # Construct title from match
-            if current:  # If a chapter was being collected
-                ordered_chapters.append("\n".join(current))  # Store the previous chapter's content
-                ordered_titles.append(current_title or "segment")  # Store title or use default
-                current = []  # Reset for next chapter
-        current.append(line)  # Add line to current chapter content
-
-    if current:  # Catch last chapter after loop ends
-        ordered_chapters.append("\n".join(current))
-        ordered_titles.append(current_title or "segment")
-
+    for title, chapter_text in split_chapters(text.splitlines()):
+        ordered_titles.append(title)
+        ordered_chapters.append(chapter_text)
     return ordered_titles, ordered_chapters  # Return lists of titles and chapters
 
-def download_book(url, title_selector, content_selector, next_button_selector):
+def scraped_lines(scraped):
+    # The cleaned lines of book.txt as save_chapters writes it from (formatted_title, cleaned_text) pairs
+    for formatted_title, cleaned_text in scraped:
+        yield from cleaned_text.split("\n")
+        yield from ("", "")  # What clean_lines leaves of the divider after each chapter
+
+def split_scraped_chapters(scraped):
+    # Turn (formatted_title, cleaned_text) pairs from stream_book into the same (title, chapter_text)
+    # pairs iter_book reads from the book.txt they are saved to. Chapters are split across pages, so a
+    # page without a "Book N and Chapter M" header continues the chapter before it; each chapter is
+    # yielded once the next header arrives, i.e. one page later than it was scraped
+    return split_chapters(scraped_lines(scraped))
+
+def format_chapter(title, content):
+    # Format and normalize the title to standard form
+    formatted_title = expand_shorthand(title)
+    full_text = f"{formatted_title}\n\n{content}"  # Combine title and content
+    return formatted_title, clean_text(full_text)  # Clean the combined text
+
+def save_chapters(chapters):
+    # Write each (formatted_title, cleaned_text) to book/book.txt as it passes through
+    os.makedirs("book", exist_ok=True)  # Create "book" folder if it doesn't exist
+    book_path = os.path.join("book", "book.txt")  # Define the path for saving scraped content
+
+    with open(book_path, "w", encoding="utf-8") as f:  # Open output file for writing
+        for formatted_title, cleaned_text in chapters:
+            # Write cleaned chapter to file with divider line
+            f.write(cleaned_text + "\n\n" + "="*80 + "\n\n")
+            f.flush()  # Keep book.txt complete up to the last yielded chapter
+            yield formatted_title, cleaned_text  # Hand the chapter to downstream stages
+
+def scrape_pages(url, title_selector, content_selector, next_button_selector):
+    # Drive a headless browser through the book, yielding (page_url, title, content) as found on each page
+    # Selenium is imported here so reading book.txt or talking to the TTS daemon never loads it
+    from selenium import webdriver  # Controls the browser
+    from selenium.webdriver.chrome.service import Service  # Manages ChromeDriver execution
+    from selenium.webdriver.chrome.options import Options  # Sets options for headless browser operation
+    from selenium.webdriver.common.by import By  # Provides methods to locate elements
+    from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, StaleElementReferenceException  # Exception handling for dynamic pages
+
     options = Options()  # Chrome options for browser behavior
     options.add_argument("--headless")  # Run browser invisibly
     options.add_argument("--disable-gpu")  # Disable GPU for headless mode
@@ -57,13 +63,10 @@ def download_book(url, title_selector, content_selector, next_button_selector):
 
     service = Service()  # Create a ChromeDriver service instance
     driver = webdriver.Chrome(service=service, options=options)  # Launch Chrome browser
-    driver.get(url)  # Open the given URL
-    time.sleep(1)  # Wait for the page to fully load
+    try:
+        driver.get(url)  # Open the given URL
+        time.sleep(1)  # Wait for the page to fully load
 
-    os.makedirs("book", exist_ok=True)  # Create "book" folder if it doesn't exist
-    book_path = os.path.join("book", "book.txt")  # Define the path for saving scraped content
-
-    with open(book_path, "w", encoding="utf-8") as f:  # Open output file for writing
         while True:
             try:
                 # Locate and extract the chapter title element using the selector
@@ -74,13 +77,7 @@ def download_book(url, title_selector, content_selector, next_button_selector):
                 content_elem = driver.find_element(By.CSS_SELECTOR, content_selector)
                 content = content_elem.text  # Get the text of the content
 
-                # Format and normalize the title to standard form
-                formatted_title = re.sub(r'\bB(\d+)(C(\d+))?\b', lambda m: f"Book {m.group(1)}" + (f" and Chapter {m.group(3)}" if m.group(3) else ""), title)
-                full_text = f"{formatted_title}\n\n{content}"  # Combine title and content
-                cleaned_text = clean_text(full_text)  # Clean the combined text
-
-                # Write cleaned chapter to file with divider line
-                f.write(cleaned_text + "\n\n" + "="*80 + "\n\n")
+                yield driver.current_url, title, content
 
                 # Click the next chapter button to proceed
                 next_button = driver.find_element(By.CSS_SELECTOR, next_button_selector)
@@ -89,5 +86,65 @@ def download_book(url, title_selector, content_selector, next_button_selector):
 
             except (NoSuchElementException, ElementNotInteractableException, StaleElementReferenceException):
                 break  # Exit loop when there's no more content or button is unavailable
-
-    driver.quit()  # Close the browser session when done
+    finally:
+        driver.quit()  # Close the browser session when done, even if a consumer stopped early
+
+def scrape_chapters(url, title_selector, content_selector, next_button_selector):
+    # Drive a headless browser through the book, yielding (formatted_title, cleaned_text)
+    pages = scrape_pages(url, title_selector, content_selector, next_button_selector)
+    with closing(pages):
+        for page_url, title, content in pages:
+            yield format_chapter(title, content)
+
+def stream_pages(url, title_selector, content_selector, next_button_selector, engine="selenium", **engine_options):
+    # Raw (page_url, title, content) for every chapter from `url` on, with either engine
+    if engine == "http":
+        from http_scraper import scrape_pages_http  # Only needs requests/bs4 when used
+        return scrape_pages_http(url, title_selector, content_selector, next_button_selector, **engine_options)
+    return scrape_pages(url, title_selector, content_selector, next_button_selector)
+
+def update_book(store, book, url, title_selector, content_selector, next_button_selector, engine="selenium",
+                **engine_options):
+    # Incrementally scrape a book into a ChapterStore. Scraping resumes at the newest stored
+    # chapter's page, which is fetched again because its next link may have only just appeared,
+    # so only chapters from there on are downloaded. Yields (number, formatted_title, cleaned_text,
+    # changed) for every chapter fetched, storing each one before it is yielded
+    store.add_book(book, url)
+    last = store.last_chapter(book)
+    number, start_url = (last[0] - 1, last[1]) if last is not None and last[1] else (0, url)
+    pages = stream_pages(start_url, title_selector, content_selector, next_button_selector, engine, **engine_options)
+    with closing(pages):
+        for page_url, title, content in pages:
+            number += 1
+            formatted_title, cleaned_text = format_chapter(title, content)
+            changed = store.put_chapter(book, number, page_url, formatted_title, cleaned_text,
+                                        raw_title=title, raw_text=content)
+            yield number, formatted_title, cleaned_text, changed
+
+def stream_stored_book(store, book, url, title_selector, content_selector, next_button_selector, engine="selenium",
+                       **engine_options):
+    # Like stream_book, backed by a ChapterStore: chapters already stored come straight from the
+    # store, then the ones update_book scrapes from the newest stored chapter on
+    last = store.last_chapter(book)
+    if last is not None and last[1]:  # Scraping resumes at the last chapter, so it comes from the scrape
+        yield from store.chapters(book, 1, last[0] - 1)
+    for number, formatted_title, cleaned_text, changed in update_book(
+            store, book, url, title_selector, content_selector, next_button_selector, engine, **engine_options):
+        yield formatted_title, cleaned_text
+
+def stream_book(url, title_selector, content_selector, next_button_selector, engine="selenium", **engine_options):
+    # Scrape chapter by chapter, appending each one to book/book.txt and yielding
+    # (formatted_title, cleaned_text) as soon as it has been downloaded.
+    # engine="http" fetches pages without a browser (see http_scraper.scrape_chapters_http)
+    if engine == "http":
+        from http_scraper import scrape_chapters_http  # Only needs requests/bs4 when used
+        chapters = scrape_chapters_http(url, title_selector, content_selector, next_button_selector, **engine_options)
+    else:
+        chapters = scrape_chapters(url, title_selector, content_selector, next_button_selector)
+    with closing(chapters):  # Stopping early still quits the browser / closes connections
+        yield from save_chapters(chapters)
+
+def download_book(url, title_selector, content_selector, next_button_selector, engine="selenium", **engine_options):
+    # Scrape the whole book into book/book.txt
+    for _ in stream_book(url, title_selector, content_selector, next_button_selector, engine, **engine_options):
+        pass
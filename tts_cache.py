@@ -0,0 +1,223 @@
+# tts_cache.py
+import hashlib  # For content-addressed cache keys
+import json  # For the cache index
+import os  # For cache file paths
+import time  # For least-recently-used bookkeeping
+import numpy as np  # For writing and memory-mapping cached audio
+
+def normalize_text(text):
+    # Strip whitespace noise that does not change what gets spoken, but keep line breaks
+    # because kokoro splits its chunks on them
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+def cache_key(text, voice, speed, lang_code, model_version):
+    # Hash everything that influences the generated audio
+    payload = json.dumps([normalize_text(text), voice, float(speed), lang_code, model_version])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ChunkCache:
+    # Persistent content-addressed store for pipeline output. Each entry holds the audio
+    # for one pipeline call as a raw float32 file (memory-mapped on read) next to a small
+    # JSON sidecar with the chunk boundaries and text. A shared index keeps only each
+    # entry's size and last use, for LRU eviction under a size cap; it is flushed every
+    # `flush_every` commits and on save(), and entries committed after the last flush are
+    # picked up again from their sidecars.
+
+    def __init__(self, cache_dir="cache", max_bytes=20 * 2**30, flush_every=64):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes  # Size cap for all cached audio
+        self.flush_every = flush_every  # Commits between index writes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = 0  # Commits since the index was last written
+        os.makedirs(cache_dir, exist_ok=True)  # Create cache directory if it doesn't exist
+
+        self.entries = {}  # key -> {"size", "last_used"}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                self.entries = json.load(index_file)
+        self._recover()
+        self.total_bytes = sum(entry["size"] for entry in self.entries.values())
+
+    def _audio_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.f32")
+
+    def _chunks_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _recover(self):
+        # Bring the index in line with the entries on disk: move chunk lists out of indexes
+        # written before sidecars existed, adopt entries committed after the last flush, and
+        # delete what interrupted writes left behind (temp files, and audio whose sidecar was
+        # never written), so it doesn't take up space outside max_bytes. Assumes no other
+        # process is writing to the cache while it is opened
+        for key, entry in self.entries.items():
+            chunks = entry.pop("chunks", None)
+            if chunks is not None:
+                self._write_chunks(key, chunks)
+                self.unsaved += 1
+        names = os.listdir(self.cache_dir)
+        sidecars = set()  # Keys of complete entries
+        for name in names:
+            key, extension = os.path.splitext(name)
+            if extension == ".json" and key != "index":
+                sidecars.add(key)
+        for name in names:
+            key, extension = os.path.splitext(name)
+            if extension == ".tmp" or (extension == ".f32" and key not in sidecars):
+                os.remove(os.path.join(self.cache_dir, name))
+        for key in [key for key in self.entries if key not in sidecars]:  # Never completed, or deleted by hand
+            del self.entries[key]
+            self.unsaved += 1
+        for key in sidecars - self.entries.keys():
+            audio_path = self._audio_path(key)
+            size = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+            self.entries[key] = {"size": size, "last_used": os.path.getmtime(self._chunks_path(key))}
+            self.unsaved += 1
+
+    def _write_chunks(self, key, chunks):
+        temp_path = self._chunks_path(key) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as chunks_file:
+            json.dump(chunks, chunks_file)
+        os.replace(temp_path, self._chunks_path(key))
+
+    def get(self, key):
+        # Return the cached [(gs, ps, audio), ...] for a key, or None on a miss
+        entry = self.entries.get(key)
+        if entry is None or (entry["size"] and not os.path.exists(self._audio_path(key))):
+            self.misses += 1
+            return None
+        try:
+            with open(self._chunks_path(key), "r", encoding="utf-8") as chunks_file:
+                entry_chunks = json.load(chunks_file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry["last_used"] = time.time()  # Mark as recently used
+
+        audio = np.memmap(self._audio_path(key), dtype=np.float32, mode="r") if entry["size"] else None
+        chunks = []
+        offset = 0
+        for gs, ps, samples in entry_chunks:
+            chunks.append((gs, ps, audio[offset:offset + samples] if samples else None))
+            offset += samples
+        return chunks
+
+    def writer(self, key):
+        # Open an entry for incremental writing; nothing is visible until commit()
+        return CacheEntryWriter(self, key)
+
+    def _commit(self, key, temp_path, chunks, size):
+        if size:
+            os.replace(temp_path, self._audio_path(key))  # Publish the finished audio file
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+        self._write_chunks(key, chunks)  # Written last: a sidecar means the entry is complete
+        previous = self.entries.get(key)
+        self.total_bytes += size - (previous["size"] if previous else 0)
+        self.entries[key] = {"size": size, "last_used": time.time()}
+        self._evict()
+        self.unsaved += 1
+        if self.unsaved >= self.flush_every:
+            self.save()
+
+    def _evict(self):
+        # Drop least recently used entries until the cache fits under its cap
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.total_bytes -= self.entries.pop(key)["size"]
+            for path in (self._chunks_path(key), self._audio_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.unsaved += 1
+
+    def save(self):
+        # Write the index atomically so a crash never leaves it half-written
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self.entries, index_file)
+        os.replace(temp_path, self.index_path)
+        self.unsaved = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.total_bytes}
+
+class CacheEntryWriter:
+    # Appends chunks for one cache entry to a temp file as they are generated
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.temp_path = cache._audio_path(key) + ".tmp"
+        self.file = open(self.temp_path, "wb")
+        self.chunks = []  # [gs, ps, samples] for every chunk written
+        self.size = 0  # Bytes of audio written
+
+    def write(self, gs, ps, audio):
+        if audio is None:
+            self.chunks.append([gs, ps, 0])
+            return
+        data = np.asarray(audio, dtype=np.float32).reshape(-1)
+        data.tofile(self.file)
+        self.chunks.append([gs, ps, len(data)])
+        self.size += data.nbytes
+
+    def commit(self):
+        self.file.close()
+        self.cache._commit(self.key, self.temp_path, self.chunks, self.size)
+
+    def discard(self):
+        # Throw away a partial entry, e.g. when synthesis was interrupted
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class CachedPipeline:
+    # Drop-in wrapper for a KPipeline that serves repeated text from a ChunkCache.
+    # The real pipeline is only built on the first cache miss.
+
+    def __init__(self, load_pipeline, cache, lang_code, model_version):
+        self.load_pipeline = load_pipeline  # Zero-argument factory for the real pipeline
+        self.cache = cache
+        self.lang_code = lang_code
+        self.model_version = model_version
+        self.pipeline = None
+
+    def lookup(self, text, voice, speed=1):
+        # Cached [(gs, ps, audio), ...] for this call, or None on a miss
+        return self.cache.get(cache_key(text, voice, speed, self.lang_code, self.model_version))
+
+    def entry(self, text, voice, speed=1):
+        # Open a cache entry for chunks of this call that are generated elsewhere, one at a time
+        return self.cache.writer(cache_key(text, voice, speed, self.lang_code, self.model_version))
+
+    def store(self, text, voice, speed, chunks):
+        # Save chunks that were generated elsewhere, e.g. by a worker process
+        entry = self.entry(text, voice, speed)
+        for gs, ps, audio in chunks:
+            entry.write(gs, ps, audio)
+        entry.commit()
+
+    def __call__(self, text, voice, speed=1):
+        cached = self.lookup(text, voice, speed)
+        if cached is not None:
+            yield from cached
+            return
+
+        if self.pipeline is None:
+            self.pipeline = self.load_pipeline()
+        entry = self.cache.writer(cache_key(text, voice, speed, self.lang_code, self.model_version))
+        try:
+            for gs, ps, audio in self.pipeline(text, voice=voice, speed=speed):
+                entry.write(gs, ps, audio)  # Persist each chunk as it is produced
+                yield gs, ps, audio
+        except BaseException:
+            entry.discard()
+            raise
+        else:
+            entry.commit()
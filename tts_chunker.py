@@ -0,0 +1,117 @@
+# tts_chunker.py
+import re  # For line and sentence boundaries
+from collections import deque  # For units and results waiting between batches
+
+# Sentence boundaries: whitespace after ., !, ? or … (optionally followed by a closing quote or bracket)
+sentence_boundary = re.compile(r'(?:(?<=[.!?…])|(?<=[.!?…]["\'”’)\]]))\s+')
+# Lines ending in one of these already carry their own pause when joined to the next one
+closing_punctuation = re.compile(r'[.!?…:;,]["\'”’)\]]*$')
+
+DEFAULT_UNIT_CHARS = 350  # Comfortably under kokoro's 510 phoneme-token limit for English prose
+
+def split_sentences(text):
+    # Sentences of a text, one line at a time; a line without closing punctuation gets a period,
+    # so headers and short dialogue lines keep their pause once they share a unit with other lines
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not closing_punctuation.search(line):
+            line += "."
+        yield from sentence_boundary.split(line)
+
+def pack_units(text, max_chars=DEFAULT_UNIT_CHARS):
+    # Greedily pack consecutive sentences into units of at most max_chars characters, joined
+    # on one line so the pipeline treats each unit as a single chunk. A sentence longer than
+    # max_chars becomes a unit of its own (the pipeline splits it further).
+    unit = ""
+    for sentence in split_sentences(text):
+        if unit and len(unit) + 1 + len(sentence) > max_chars:
+            yield unit
+            unit = ""
+        unit = f"{unit} {sentence}" if unit else sentence
+    if unit:
+        yield unit
+
+class ChunkedPipeline:
+    # Wraps a pipeline so it synthesizes token-budgeted sentence units instead of letting the
+    # pipeline cut each line into its own chunk: fewer, fuller forward passes per chapter.
+    # Units never cross the chapter passed in, so chapter boundaries in the output stay exact.
+
+    def __init__(self, pipeline, max_chars=DEFAULT_UNIT_CHARS):
+        self.pipeline = pipeline
+        self.max_chars = max_chars
+
+    def units(self, text):
+        return pack_units(text, self.max_chars)
+
+    def synthesize_units(self, units, voice, speed=1):
+        # [[(gs, ps, audio), ...] per unit]; one batched call if the pipeline supports it
+        batch = getattr(self.pipeline, "batch", None)
+        if batch is not None:
+            return batch(units, voice=voice, speed=speed)
+        return [list(self.pipeline(unit, voice=voice, speed=speed)) for unit in units]
+
+    def __call__(self, text, voice, speed=1):
+        for unit in self.units(text):
+            yield from self.pipeline(unit, voice=voice, speed=speed)
+
+def load_chunked_pipeline(load_pipeline, max_chars=DEFAULT_UNIT_CHARS):
+    # Picklable pipeline factory (via functools.partial) for worker processes
+    return ChunkedPipeline(load_pipeline(), max_chars)
+
+def synthesize_batched(texts, load_pipeline, voice, speed, batch_size=8, cached=None):
+    # Synthesize chapters as batches of units, where a batch may take units from several
+    # consecutive chapters, and yield one chunk iterator per chapter in input order (each must
+    # be consumed before the next). `load_pipeline` returns a ChunkedPipeline; it is only
+    # loaded once something misses the cache. Chapters are read ahead only as far as needed to
+    # fill one batch, so at most one batch of audio is held in memory. If `cached` (a
+    # CachedPipeline) is given, cached chapters never reach the model and freshly synthesized
+    # ones are written back chunk by chunk.
+    chapters = iter(texts)
+    plan = deque()  # (text, cached chunks or None, unit count) for chapters read so far
+    waiting = deque()  # Units of planned chapters not yet synthesized
+    ready = deque()  # [(gs, ps, audio), ...] per synthesized unit, in unit order
+    state = {"pipeline": None}
+
+    def read_chapter():
+        text = next(chapters, None)
+        if text is None:
+            return False
+        chunks = cached.lookup(text, voice, speed) if cached is not None else None
+        if chunks is not None:
+            plan.append((text, chunks, 0))
+            return True
+        if state["pipeline"] is None:
+            state["pipeline"] = load_pipeline()
+        units = list(state["pipeline"].units(text))
+        waiting.extend(units)
+        plan.append((text, None, len(units)))
+        return True
+
+    def run_batch():
+        while len(waiting) < batch_size and read_chapter():  # Top the batch up from the next chapters
+            pass
+        batch = [waiting.popleft() for _ in range(min(batch_size, len(waiting)))]
+        ready.extend(state["pipeline"].synthesize_units(batch, voice, speed))
+
+    def chapter_chunks(text, unit_count):
+        entry = cached.entry(text, voice, speed) if cached is not None else None
+        try:
+            for _ in range(unit_count):
+                if not ready:
+                    run_batch()
+                for gs, ps, audio in ready.popleft():
+                    if entry is not None:
+                        entry.write(gs, ps, audio)
+                    yield gs, ps, audio
+        except BaseException:
+            if entry is not None:
+                entry.discard()
+            raise
+        if entry is not None:
+            entry.commit()
+
+    while plan or read_chapter():
+        text, chunks, unit_count = plan.popleft()
+        yield iter(chunks) if chunks is not None else chapter_chunks(text, unit_count)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# tts_client.py
+# Thin client for tts_daemon. Only needs the standard library and the text engine, so
+# submitting a book costs milliseconds instead of a model load. Messages are
+# newline-delimited JSON over a Unix socket; the daemon answers a submit with a stream
+# of events (queued, started, chapter, done / error) that ends when the job does.
+import argparse  # For command line options
+import json  # For the wire format
+import os  # For the default socket path
+import socket  # For talking to the daemon
+
+DEFAULT_SOCKET = os.path.join("audio", "tts.sock")  # Where the daemon listens unless told otherwise
+
+def send_message(sock_file, message):
+    # Write one JSON message as a single line
+    sock_file.write((json.dumps(message) + "\n").encode("utf-8"))
+    sock_file.flush()
+
+def read_messages(sock_file):
+    # Yield JSON messages, one per line, until the other side closes the connection
+    for line in sock_file:
+        if line.strip():
+            yield json.loads(line)
+
+def request(message, socket_path=DEFAULT_SOCKET):
+    # Send one request and yield every event the daemon answers with
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as sock_file:
+            send_message(sock_file, message)
+            yield from read_messages(sock_file)
+
+def submit_chapters(titles, chapters, socket_path=DEFAULT_SOCKET, priority=0, **options):
+    # Queue a job rendering parallel lists of titles and chapter texts; yields its progress events.
+    # Higher priority jobs run first; options are generate_audio_stream settings such as voice,
+    # speed, lang_code, output_dir or output_format
+    for key in ("output_dir", "cache_dir", "report_path"):  # The daemon runs in its own working directory
+        if options.get(key):
+            options[key] = os.path.abspath(options[key])
+    message = {"op": "submit", "priority": priority, "options": options,
+               "chapters": [[title, chapter_text] for title, chapter_text in zip(titles, chapters)]}
+    for event in request(message, socket_path):
+        if event["event"] == "error":
+            raise RuntimeError(f"TTS job {event.get('job')} failed: {event['error']}")
+        yield event
+
+def submit_book(book_path, socket_path=DEFAULT_SOCKET, priority=0, **options):
+    # Split a cleaned book.txt the same way main.py does and queue it as one job
+    from text_scraper import extract_chapters_and_titles  # Text engine only, no browser
+    with open(book_path, "r", encoding="utf-8") as book_file:
+        titles, chapters = extract_chapters_and_titles(book_file.read())
+    yield from submit_chapters(titles, chapters, socket_path, priority, **options)
+
+def submit_stored_book(library_path, book, first=1, last=None, socket_path=DEFAULT_SOCKET, priority=0, **options):
+    # Queue a chapter range of a book in the chapter library as one job
+    from chapter_store import ChapterStore  # SQLite and the text engine, no browser
+    with ChapterStore(library_path) as store:
+        titles, chapters = store.titles_and_chapters(book, first, last)
+    if not chapters:  # Unknown book, empty book or a range past its end
+        raise ValueError(f"No chapters {first}-{last or 'end'} of {book!r} in {library_path}")
+    yield from submit_chapters(titles, chapters, socket_path, priority, **options)
+
+def status(socket_path=DEFAULT_SOCKET):
+    # Running job and queued job ids
+    return next(request({"op": "status"}, socket_path))
+
+def shutdown(socket_path=DEFAULT_SOCKET):
+    # Ask the daemon to exit once the running job has finished
+    return next(request({"op": "shutdown"}, socket_path))
+
+def format_event(event):
+    # One progress line per event
+    if event["event"] == "queued":
+        return f"Job {event['job']} queued ({event['ahead']} ahead)"
+    if event["event"] == "started":
+        return f"Job {event['job']} started"
+    if event["event"] == "chapter":
+        return (f"Job {event['job']}: chapter {event['chapter']} {event['title']} "
+                f"({event['audio_seconds']:.0f} s audio in {event['synth_seconds']:.1f} s)")
+    if event["event"] == "done":
+        summary = event["summary"]
+        return f"Job {event['job']} done: {summary['chapters']} chapters, {summary['audio_seconds'] / 3600:.2f} h audio"
+    return json.dumps(event)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Submit a book to the TTS daemon and follow its progress")
+    parser.add_argument("book_path", nargs="?", default=os.path.join("book", "book.txt"), help="cleaned book.txt to render")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="daemon socket path")
+    parser.add_argument("--priority", type=int, default=0, help="higher runs first")
+    parser.add_argument("--voice", default="am_onyx", help="kokoro voice")
+    parser.add_argument("--speed", type=float, default=1.25, help="speaking speed")
+    parser.add_argument("--output-dir", default="audio", help="where the daemon writes the audio")
+    parser.add_argument("--format", default="wav", help="output format, see main.py --format")
+    parser.add_argument("--book", help="submit this book from the chapter library instead of a book.txt")
+    parser.add_argument("--library", default=os.path.join("book", "library.sqlite3"), help="chapter library file")
+    parser.add_argument("--first", type=int, default=1, help="with --book: first chapter number")
+    parser.add_argument("--last", type=int, help="with --book: last chapter number")
+    parser.add_argument("--status", action="store_true", help="show the daemon's queue and exit")
+    parser.add_argument("--shutdown", action="store_true", help="stop the daemon and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps(status(args.socket)))
+    elif args.shutdown:
+        print(json.dumps(shutdown(args.socket)))
+    else:
+        options = {"voice": args.voice, "speed": args.speed, "output_dir": args.output_dir, "output_format": args.format}
+        if args.book:
+            events = submit_stored_book(args.library, args.book, args.first, args.last, args.socket, args.priority, **options)
+        else:
+            events = submit_book(args.book_path, args.socket, args.priority, **options)
+        for event in events:
+            print(format_event(event))
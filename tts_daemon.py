@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# tts_daemon.py
+# Long-running local synthesis service. Pipelines (and the voices they have loaded)
+# stay in memory between jobs, so each book only pays for synthesis, not for loading
+# the model. Clients connect over a Unix socket (see tts_client for the protocol),
+# submit jobs and get their progress streamed back. Jobs run one at a time on a single
+# worker thread, highest priority first and in submission order within a priority.
+import argparse  # For command line options
+import itertools  # For job numbers
+import os  # For the socket file
+import queue  # For the priority job queue and per-job event queues
+import socket  # For detecting a daemon that is already running
+import socketserver  # For the Unix socket server
+import threading  # For the job worker
+from audio_generator import generate_audio_stream, load_kokoro_pipeline  # Render loop and the real model
+from audio_dsp import AudioPostProcessor  # Per-job post-processing stage
+from metrics import RenderMetrics  # Per-chapter timings, streamed to the client as progress
+from tts_client import DEFAULT_SOCKET, send_message, read_messages  # Wire protocol
+
+# generate_audio_stream settings a client may choose per job (postprocess as a dict of AudioPostProcessor
+# arguments); the pipeline, worker count and preview are the daemon's
+JOB_OPTIONS = {"voice", "speed", "lang_code", "output_dir", "output_format", "writer_options", "subtype",
+               "segment_minutes", "segment_mib", "chapters_per_segment", "cache_dir", "cache_max_bytes", "force",
+               "report_path", "unit_chars", "batch_size", "postprocess"}
+
+class WarmPipelines:
+    # One loaded pipeline per language, kept for the life of the daemon
+
+    def __init__(self, load_pipeline, voices=()):
+        self.load_pipeline = load_pipeline  # lang_code -> pipeline
+        self.voices = voices  # Voices to load up front, so the first job using them doesn't wait
+        self.pipelines = {}  # lang_code -> pipeline
+        self.lock = threading.Lock()
+
+    def get(self, lang_code):
+        with self.lock:
+            pipeline = self.pipelines.get(lang_code)
+            if pipeline is None:
+                pipeline = self.load_pipeline(lang_code)
+                load_voice = getattr(pipeline, "load_voice", None)  # KPipeline caches every voice it loads
+                for voice in self.voices if load_voice is not None else ():
+                    load_voice(voice)
+                self.pipelines[lang_code] = pipeline
+            return pipeline
+
+class Job:
+    # One submitted book: its chapters, render settings and the events reported back to the client
+
+    def __init__(self, number, chapters, options, priority):
+        self.number = number
+        self.chapters = chapters  # [(title, chapter_text), ...]
+        self.options = options  # generate_audio_stream settings
+        self.priority = priority  # Higher runs first
+        self.events = queue.Queue()  # Progress events for the submitting connection
+
+class TTSDaemon:
+    # Accepts jobs on a Unix socket and renders them one at a time with warm pipelines
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, load_pipeline=None, device='cuda', voices=(), cache_dir="cache"):
+        # load_pipeline: lang_code -> pipeline factory; defaults to kokoro on `device`
+        # cache_dir: TTS cache for jobs that don't name their own (None disables caching)
+        self.socket_path = socket_path
+        self.pipelines = WarmPipelines(load_pipeline or (lambda lang_code: load_kokoro_pipeline(lang_code, device)), voices)
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir is not None else None
+        self.jobs = queue.PriorityQueue()  # (-priority, job number, job); job None stops the worker
+        self.job_numbers = itertools.count(1)
+        self.queued = {}  # job number -> Job still waiting to run
+        self.running = None  # Job currently rendering
+        self.stopping = False
+        self.lock = threading.Lock()
+
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(socket_path) == 0:
+                    raise RuntimeError(f"A TTS daemon is already listening on {socket_path}")
+            os.remove(socket_path)  # Left behind by a daemon that did not exit cleanly
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        self.server = socketserver.ThreadingUnixStreamServer(socket_path, DaemonConnection)
+        self.server.daemon_threads = True  # Connections never keep the process alive
+        self.server.tts = self
+
+    def preload(self, lang_codes):
+        # Load pipelines before the first job arrives
+        for lang_code in lang_codes:
+            self.pipelines.get(lang_code)
+
+    def submit(self, chapters, options, priority=0):
+        # Queue a job and return it; raises ValueError for jobs the daemon cannot take
+        unknown = set(options) - JOB_OPTIONS
+        if unknown:
+            raise ValueError(f"Unsupported job options: {', '.join(sorted(unknown))}")
+        chapters = [(title, chapter_text) for title, chapter_text in chapters]
+        with self.lock:
+            if self.stopping:
+                raise ValueError("The TTS daemon is shutting down")
+            job = Job(next(self.job_numbers), chapters, options, priority)
+            ahead = sum(1 for other in self.queued.values() if other.priority >= priority) + (self.running is not None)
+            job.events.put({"event": "queued", "job": job.number, "ahead": ahead})
+            self.queued[job.number] = job
+            self.jobs.put((-priority, job.number, job))
+        return job
+
+    def status(self):
+        with self.lock:
+            waiting = sorted(self.queued.values(), key=lambda job: (-job.priority, job.number))
+            return {"event": "status", "running": self.running.number if self.running else None,
+                    "queued": [job.number for job in waiting]}
+
+    def stop(self):
+        # Finish the running job, fail the queued ones and stop serving
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+            self.jobs.put((float("-inf"), 0, None))  # Sorts ahead of every job
+
+    def run(self, job):
+        # Render one job with the warm pipeline for its language, streaming chapter progress
+        job.events.put({"event": "started", "job": job.number})
+        options = dict(job.options)
+        options.setdefault("cache_dir", self.cache_dir)
+        if options.get("postprocess") is not None:  # AudioPostProcessor arguments; the stage keeps per-job state
+            options["postprocess"] = AudioPostProcessor(**options["postprocess"])
+        metrics = RenderMetrics(on_chapter=lambda row: job.events.put({"event": "chapter", "job": job.number, **row}))
+        try:
+            pipeline = self.pipelines.get(options.get("lang_code", "a"))
+            generate_audio_stream(job.chapters, load_pipeline=lambda: pipeline, workers=1, metrics=metrics, **options)
+        except Exception as error:  # A bad job must not take the daemon down
+            job.events.put({"event": "error", "job": job.number, "error": f"{type(error).__name__}: {error}"})
+        else:
+            job.events.put({"event": "done", "job": job.number, "summary": metrics.summary()})
+
+    def work(self):
+        # Job worker: one job at a time, in priority order
+        while True:
+            priority, number, job = self.jobs.get()
+            if job is None:
+                break
+            with self.lock:
+                del self.queued[number]
+                self.running = job
+            try:
+                self.run(job)
+            finally:
+                with self.lock:
+                    self.running = None
+        with self.lock:
+            for job in self.queued.values():
+                job.events.put({"event": "error", "job": job.number, "error": "The TTS daemon shut down"})
+            self.queued.clear()
+        self.server.shutdown()
+
+    def serve_forever(self):
+        # Serve until a client asks for shutdown
+        worker = threading.Thread(target=self.work, name="tts-worker", daemon=True)
+        worker.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+            worker.join()
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+class DaemonConnection(socketserver.StreamRequestHandler):
+    # One request per connection; a submit keeps the connection open and streams job events
+
+    def handle(self):
+        tts = self.server.tts
+        message = next(read_messages(self.rfile), None)
+        if message is None:
+            return
+        op = message.get("op")
+        if op == "status":
+            send_message(self.wfile, tts.status())
+        elif op == "shutdown":
+            tts.stop()
+            send_message(self.wfile, {"event": "stopping"})
+        elif op == "submit":
+            try:
+                job = tts.submit(message["chapters"], message.get("options", {}), message.get("priority", 0))
+            except (KeyError, TypeError, ValueError) as error:
+                send_message(self.wfile, {"event": "error", "job": None, "error": str(error)})
+                return
+            while True:
+                event = job.events.get()
+                try:
+                    send_message(self.wfile, event)
+                except OSError:  # Client went away; the job still runs to completion
+                    return
+                if event["event"] in ("done", "error"):
+                    return
+        else:
+            send_message(self.wfile, {"event": "error", "job": None, "error": f"Unknown op {op!r}"})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep TTS pipelines loaded and render books submitted by tts_client")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on")
+    parser.add_argument("--device", default="cuda", help="device for the TTS model, e.g. cuda or cpu")
+    parser.add_argument("--lang-codes", nargs="*", default=["a"], help="pipelines to load at startup")
+    parser.add_argument("--voices", nargs="*", default=["am_onyx"], help="voices to load at startup")
+    parser.add_argument("--cache-dir", default="cache", help="TTS cache directory for jobs that don't name one")
+    args = parser.parse_args()
+
+    daemon = TTSDaemon(args.socket, device=args.device, voices=args.voices, cache_dir=args.cache_dir)
+    daemon.preload(args.lang_codes)
+    print(f"TTS daemon listening on {args.socket}")
+    daemon.serve_forever()